@@ -5,17 +5,24 @@ from flask import Flask, Request, abort, g, jsonify, request, make_response
 
 from flask_cors import CORS
 from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
 
-from app.api.auth import generate_api_key
+from app.api.auth import generate_api_key, token_cache
+from app.api.rate_limit import get_rate_limit, get_rate_limit_key
+from app.commands import cli as vapi_cli
 # from app.db.db_connect import VDBConnect, MySQLdb
+from app.db.mongodb_connect import client_created_count
+from app.db.monitoring import command_monitor
 from app.errors import error_response
+from app.metrics import (COLLECTORS, merge_snapshots, observe_request, observe_spans,
+                         read_snapshots, render_json, render_text, snapshot_writer)
+from app import timing
 # from app.api.v1.province import bp as api_province_bp
 from app.api.v2.province import bp as api_v2_province_bp
 # from app.api.v1.gold import bp as api_gold_bp
 from app.api.v2.gold import bp as api_v2_gold_bp
 # from app.api.v1.exchange_rate import bp as api_exchange_rate_bp
 from app.api.v2.exchange_rate import bp as api_v2_exchange_rate_bp
+from app.api.v2.admin import bp as api_v2_admin_bp
 # from app.api.v1.vbiz import bp as api_vbiz_bp
 
 FLASK_ENV = os.environ.get("FLASK_ENV", default='production')
@@ -41,13 +48,15 @@ class ProxiedRequest(Request):
 app = Flask(__name__, static_url_path='/',
             static_folder='../docs/build/html/')  # pylint: disable=C
 CORS(app)
-limiter = Limiter(
-  get_remote_address, 
-  app=app,            
-  default_limits=["100 per minute"]
-)
 app.request_class = ProxiedRequest
+app.json = timing.TimedJSONProvider(app)
 app.config.from_object(AppConfig)
+# Storage and strategy come from the RATELIMIT_* settings of the config
+limiter = Limiter(
+  get_rate_limit_key,
+  app=app,
+  default_limits=[get_rate_limit]
+)
 
 # app.register_blueprint(api_province_bp)
 app.register_blueprint(api_v2_province_bp)
@@ -55,8 +64,33 @@ app.register_blueprint(api_v2_province_bp)
 app.register_blueprint(api_v2_gold_bp)
 # app.register_blueprint(api_exchange_rate_bp)
 app.register_blueprint(api_v2_exchange_rate_bp)
+app.register_blueprint(api_v2_admin_bp)
 # app.register_blueprint(api_vbiz_bp)
 
+app.cli.add_command(vapi_cli)
+
+command_monitor.slow_seconds = app.config.get('SLOW_QUERY_MS', 100) / 1000
+
+if app.config.get('MONGODB_CREATE_INDEXES'):
+    from app.db.indexes import ensure_indexes
+    from app.db.mongodb_connect import get_client
+    with app.app_context():
+        ensure_indexes(get_client())
+
+
+def worker_values():
+    """Per-worker values reported by /metrics"""
+    jwt_cache = token_cache.stats()
+    return {
+        'vapi_mongo_clients_created_total': client_created_count(),
+        'vapi_jwt_cache_hits_total': jwt_cache['hits'],
+        'vapi_jwt_cache_misses_total': jwt_cache['misses'],
+        'vapi_jwt_cache_size': jwt_cache['size']
+    }
+
+
+COLLECTORS.append(worker_values)
+
 CURRENT_YEAR = time.strftime("%Y")
 BASE_TITLE = ('vAPI - Open API for Vietnamese projects')
 BASE_DESCRIPTION = ('Open API for Vietnamese projects')
@@ -75,15 +109,30 @@ def request_api_key():
         'results': generate_api_key(
             scope=request.args.get('scope'),
             permission=request.args.get('permission'),
-            dtl=request.args.get('dtl')
+            dtl=request.args.get('dtl'),
+            timing=request.args.get('timing') in ('1', 'true')
         )
     }
     return make_response((jsonify(responses)), 200)
 
 
+@app.route('/metrics')
+@limiter.exempt
+def metrics():
+    """Request metrics of every worker, Prometheus text or ?format=json"""
+    merged, values = merge_snapshots(read_snapshots(app))
+    if request.args.get('format') == 'json':
+        return make_response((jsonify(render_json(merged, values))), 200)
+    return make_response((
+        render_text(merged, values), 200,
+        {'Content-Type': 'text/plain; version=0.0.4'}
+    ))
+
+
 @app.before_request
 def before_request():
     g.start = time.time()
+    timing.start(request.endpoint)
     ua = request.headers.get("User-Agent", "")
     if "Hutool" in ua:
       abort(429, description="Too Many Requests")
@@ -91,5 +140,23 @@ def before_request():
 
 @app.after_request
 def after_request(response):
-    print('total: %s' % (time.time() - g.start))
+    # Requests rejected by the limiter never reach before_request
+    start = g.get('start')
+    total = time.time() - start if start else 0
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    observe_request(route, response.status_code, total, response.content_length or 0)
+
+    recorder = timing.stop()
+    if recorder is not None:
+        observe_spans(route, recorder.spans)
+        payload = g.get('api_key_payload') or {}
+        if app.config.get('SERVER_TIMING') or payload.get('timing'):
+            response.headers['Server-Timing'] = timing.server_timing_header(recorder, total)
+    snapshot_writer.ensure_started()
     return response
+
+
+@app.teardown_request
+def teardown_request(error):  # pylint: disable=W
+    # Unhandled errors skip after_request
+    timing.stop()
@@ -1,39 +1,138 @@
 import datetime
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from functools import wraps
 
 import jwt
-from flask import current_app, request
+from flask import current_app, g, request
 
+from app.api.usage import usage_meter
 from app.errors import error_response
+from app.timing import span
 
 
-def require_api_key(scope='', permission=0):
+class TokenCache:
+    """Bounded LRU of verified api_key digests to their JWT payload.
+
+    Entries expire at the token's ``exp``, so a cached key is never
+    accepted after jwt.decode() would have rejected it.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest):
+        """Payload of a verified digest, None if unknown or expired"""
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and entry[0] > time.time():
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[digest]
+            self.misses += 1
+            return None
+
+    def put(self, digest, payload, max_size):
+        """Remember a verified payload until its exp"""
+        if max_size <= 0 or 'exp' not in payload:
+            return
+        with self._lock:
+            self._entries[digest] = (payload['exp'], payload)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        """Size and hit/miss counters"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache()  # pylint: disable=C
+
+
+def get_api_key_digest(api_key):
+    """Digest identifying an api_key without keeping the key itself"""
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+
+
+def get_api_key():
+    """api_key of the current request, False if there is none"""
+    api_key = False
+    if request.headers.get('Authorization'):
+        parts = request.headers['Authorization'].split(" ", 1)
+        if len(parts) == 2 and parts[1].strip():
+            api_key = parts[1].strip()
+    elif request.args.get('api_key'):
+        api_key = request.args.get('api_key')
+    return api_key
+
+
+def decode_api_key(api_key):
+    """Verified payload of an api_key, skipping jwt.decode for known keys"""
+    digest = get_api_key_digest(api_key)
+    payload = token_cache.get(digest)
+    if payload is None:
+        payload = jwt.decode(
+            api_key,
+            current_app.config.get('SECRET_KEY'),
+            algorithms=['HS256']
+        )
+        token_cache.put(digest, payload, current_app.config.get('JWT_CACHE_SIZE', 10000))
+    g.api_key_digest = digest
+    g.api_key_payload = payload
+    return payload
+
+
+def require_api_key(scope='', permission=0, admin=False):
     def actual_decorator(func):
         @wraps(func)
         def check_api_key(*args, **kwargs):
-            api_key = False
-            if request.headers.get('Authorization'):
-                api_key = request.headers['Authorization'].split(" ")[1]
-            elif request.args.get('api_key'):
-                api_key = request.args.get('api_key')
-
             try:
-                if not api_key:
-                    raise Exception('No api_key')
+                with span('auth'):
+                    api_key = get_api_key()
+                    if not api_key:
+                        raise Exception('No api_key')
 
-                payload = jwt.decode(
-                    api_key,
-                    current_app.config.get('SECRET_KEY'),
-                    algorithms=['HS256']
-                )
+                    payload = decode_api_key(api_key)
 
-                if payload['scope'] != '*' and payload['scope'] != scope:
-                    raise Exception('Out of scope')
+                    if payload['scope'] != '*' and payload['scope'] != scope:
+                        raise Exception('Out of scope')
 
-                if permission > int(payload['permission']):
-                    raise Exception('No permission')
+                    if permission > int(payload['permission']):
+                        raise Exception('No permission')
 
-                return func(*args, **kwargs)
+                    if admin and not payload.get('admin'):
+                        raise Exception('Not an admin key')
+
+                if not current_app.config.get('USAGE_METERING', True):
+                    return func(*args, **kwargs)
+
+                start = time.time()
+                response = current_app.make_response(func(*args, **kwargs))
+                usage_meter.record(
+                    g.api_key_digest, payload, request.url_rule.rule,
+                    response.status_code, response.content_length or 0,
+                    time.time() - start
+                )
+                return response
 
             except Exception as e:
                 return error_response(403, 'Auth Error: %s' % (e))
@@ -47,6 +146,9 @@ def generate_api_key(**kwargs):
     Generates the Auth Token
     :scope: string | (gold, exchange_rate)
     :permission: int | 0:r | 1:rw | 2:rwd
+    :timing: bool | send a Server-Timing header to this key
+    :tier: string | rate limit tier of RATELIMIT_TIERS, only set for keys issued by the server
+    :admin: bool | admin endpoints, only set for keys issued by the server
     :return: string
     """
     try:
@@ -61,6 +163,12 @@ def generate_api_key(**kwargs):
             'scope': scope,
             'permission': permission
         }
+        if kwargs.get('timing'):
+            payload['timing'] = True
+        if kwargs.get('tier'):
+            payload['tier'] = kwargs['tier']
+        if kwargs.get('admin'):
+            payload['admin'] = True
         return jwt.encode(
             payload,
             current_app.config.get('SECRET_KEY'),
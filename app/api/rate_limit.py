@@ -0,0 +1,54 @@
+"""app/api/rate_limit.py
+
+Key and limit functions of the flask_limiter Limiter. Anyone can mint keys
+at ``/api/request_api_key``, so only keys issued by ``flask vapi
+issue-api-key`` with a ``tier`` claim are counted per key (by its digest)
+and limited by their tier; every other request is counted per remote
+address with the default limit.
+"""
+from flask import current_app, g
+from flask_limiter.util import get_remote_address
+
+from app.api.auth import decode_api_key, get_api_key
+
+
+def get_api_key_payload():
+    """Verified payload of the request's api_key, None if missing or invalid"""
+    if 'api_key_payload' not in g:
+        payload = None
+        api_key = get_api_key()
+        if api_key:
+            try:
+                payload = decode_api_key(api_key)
+            except Exception:
+                payload = None
+        g.api_key_payload = payload
+    return g.api_key_payload
+
+
+def get_tier():
+    """Rate limit tier of the request's api_key, None for self-issued keys"""
+    payload = get_api_key_payload()
+    if payload is None:
+        return None
+    return payload.get('tier')
+
+
+def get_rate_limit_key():
+    """Bucket of the current request"""
+    if get_tier() is not None:
+        return 'key:' + g.api_key_digest
+    return 'ip:' + get_remote_address()
+
+
+def get_rate_limit():
+    """Limit of the current request.
+
+    Keys with a tier get its limit from RATELIMIT_TIERS, every other request
+    RATELIMIT_DEFAULT.
+    """
+    default = current_app.config.get('RATELIMIT_DEFAULT', '100 per minute')
+    tier = get_tier()
+    if tier is None:
+        return default
+    return current_app.config.get('RATELIMIT_TIERS', {}).get(tier, default)
@@ -0,0 +1,123 @@
+"""app/api/usage.py
+
+Usage of every api_key, counted in memory per key, route and hour by
+``require_api_key`` and flushed to ``vapi.api_usage`` by a background thread
+of each worker every ``USAGE_FLUSH_SECONDS``, with one bulk write per flush.
+Keys are identified by the digest of the JWT, never by the JWT itself.
+"""
+import atexit
+import datetime
+import logging
+import os
+import threading
+import time
+
+from flask import current_app
+from pymongo import UpdateOne
+
+from app.db.mongodb_connect import get_client
+
+USAGE_COLLECTION = 'api_usage'
+
+logger = logging.getLogger(__name__)  # pylint: disable=C
+
+
+class UsageMeter:
+    """UsageMeter"""
+
+    def __init__(self):
+        super().__init__()
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._thread_pid = None
+
+    def record(self, digest, payload, route, status, size, seconds):
+        """Count one request of an api_key"""
+        hour = datetime.datetime.now().replace(minute=0, second=0, microsecond=0)
+        with self._lock:
+            counter = self._counters.get((digest, route, hour))
+            if counter is None:
+                counter = self._counters[(digest, route, hour)] = {
+                    'scope': payload.get('scope'),
+                    'permission': payload.get('permission'),
+                    'requests': 0,
+                    'errors': 0,
+                    'bytes': 0,
+                    'seconds': 0.0,
+                    'max_seconds': 0.0
+                }
+            counter['requests'] += 1
+            counter['errors'] += 1 if status >= 400 else 0
+            counter['bytes'] += size
+            counter['seconds'] += seconds
+            counter['max_seconds'] = max(counter['max_seconds'], seconds)
+        if self._thread_pid != os.getpid():
+            self._start()
+
+    def _start(self):
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+        app = current_app._get_current_object()  # pylint: disable=W
+        threading.Thread(
+            target=self._run,
+            args=(app,),
+            name='vapi-usage-flush',
+            daemon=True
+        ).start()
+        atexit.register(self._flush_app, app)
+
+    def _run(self, app):
+        interval = app.config.get('USAGE_FLUSH_SECONDS', 10)
+        while True:
+            time.sleep(interval)
+            self._flush_app(app)
+
+    def _flush_app(self, app):
+        try:
+            with app.app_context():
+                self.flush(get_client()['vapi'])
+        except Exception as e:
+            logger.warning('usage flush failed: %s', e)
+
+    def flush(self, db):
+        """Write the counted usage with one bulk write and reset the counters"""
+        with self._lock:
+            counters, self._counters = self._counters, {}
+        if not counters:
+            return None
+
+        requests = []
+        for (digest, route, hour), counter in counters.items():
+            requests.append(UpdateOne(
+                {
+                    '_id': {
+                        'key': digest,
+                        'route': route,
+                        'hour': hour
+                    }
+                }, {
+                    '$setOnInsert': {
+                        'key': digest,
+                        'route': route,
+                        'hour': hour,
+                        'scope': counter['scope'],
+                        'permission': counter['permission']
+                    },
+                    '$inc': {
+                        'requests': counter['requests'],
+                        'errors': counter['errors'],
+                        'bytes': counter['bytes'],
+                        'seconds': counter['seconds']
+                    },
+                    '$max': {
+                        'max_seconds': counter['max_seconds']
+                    }
+                },
+                upsert=True
+            ))
+        return db[USAGE_COLLECTION].bulk_write(requests, ordered=False)
+
+
+usage_meter = UsageMeter()  # pylint: disable=C
@@ -0,0 +1,8 @@
+""".. :quickref:
+This module allows administrators to inspect the API
+"""
+from flask import Blueprint
+
+bp = Blueprint('api_v2_admin', __name__)
+
+from app.api.v2.admin import usage  # This line must be after Blueprint
@@ -0,0 +1,134 @@
+"""app/api/v2/admin/usage.py"""
+from flask import jsonify, make_response, request
+
+from app.api.auth import require_api_key
+from app.api.usage import USAGE_COLLECTION
+from app.api.v2.admin import bp
+from app.db.mongodb_connect import MongoDBConnect
+from app.errors import error_response
+from app.helper.DateHelper import get_date_range
+
+SCOPE = 'admin'
+
+
+def get_usage_query(date_from, date_to, key=None):
+    """Usage per api_key and route over a date range, heaviest first"""
+    match = {
+        'hour': {
+            '$gte': date_from,
+            '$lt': date_to
+        }
+    }
+    if key:
+        match['key'] = key
+    return [
+        {
+            '$match': match
+        }, {
+            '$group': {
+                '_id': {
+                    'key': '$key',
+                    'route': '$route'
+                },
+                'scope': {'$first': '$scope'},
+                'permission': {'$first': '$permission'},
+                'requests': {'$sum': '$requests'},
+                'errors': {'$sum': '$errors'},
+                'bytes': {'$sum': '$bytes'},
+                'seconds': {'$sum': '$seconds'},
+                'max_seconds': {'$max': '$max_seconds'}
+            }
+        }, {
+            '$sort': {
+                'requests': -1
+            }
+        }, {
+            '$project': {
+                '_id': False,
+                'key': '$_id.key',
+                'route': '$_id.route',
+                'scope': True,
+                'permission': True,
+                'requests': True,
+                'errors': True,
+                'bytes': True,
+                'avg_ms': {
+                    '$multiply': [{'$divide': ['$seconds', '$requests']}, 1000]
+                },
+                'max_ms': {
+                    '$multiply': ['$max_seconds', 1000]
+                }
+            }
+        }
+    ]
+
+
+@bp.route('/api/v2/admin/usage', methods=['GET'])
+@require_api_key(scope=SCOPE, permission=2, admin=True)
+def api_v2_admin_usage_get():
+    """.. :quickref: 01. Usage; Get api_key usage
+
+    This function allows administrators to get the requests, errors, bytes and latency
+    of every api_key per route. Keys are identified by the sha256 digest of the api_key.
+    Counters are flushed by every worker each USAGE_FLUSH_SECONDS.
+    Only admin keys, issued by ``flask vapi issue-api-key --admin``, are accepted.
+
+    **Request**:
+
+    .. sourcecode:: http
+
+      GET /api/v2/admin/usage?from=2024-01-01&to=2024-01-31 HTTP/1.1
+      Host: https://api.vnappmob.com
+      Accept: application/json
+
+    **Response**:
+
+    .. sourcecode:: http
+
+      HTTP/1.1 200 OK
+      Vary: Accept
+      Content-Type: application/json
+
+      {
+          "results": [
+              {
+                  "key": "549ef9e4946e4496...",
+                  "route": "/api/v2/gold/sjc",
+                  "scope": "gold",
+                  "permission": 0,
+                  "requests": 120345,
+                  "errors": 12,
+                  "bytes": 24069000,
+                  "avg_ms": 1.8,
+                  "max_ms": 95.2
+              }...
+          ]
+      }
+
+    :reqheader Authorization: Bearer <api_key|scope=admin|permission=2|admin>
+    :queryparam from: Optional first date in YYYY-MM-DD format, the ``to`` date by default
+    :queryparam to: Optional last date (included) in YYYY-MM-DD format, today by default
+    :queryparam key: Optional api_key digest
+    :resheader Content-Type: application/json
+    :status 200: OK
+    :status 400: Error
+    :status 403: Fail on authorization
+    """
+    try:
+        try:
+            date_from, date_to = get_date_range(request.args, 1)
+        except ValueError:
+            return error_response(400, 'Invalid date format. Use YYYY-MM-DD format.')
+
+        db_connect = MongoDBConnect()
+        q_res = db_connect.connection['vapi'][USAGE_COLLECTION].aggregate(
+            get_usage_query(date_from, date_to, key=request.args.get('key'))
+        )
+
+        responses = {
+            'results': list(q_res)
+        }
+
+        return make_response((jsonify(responses)), 200)
+    except Exception as e:
+        return error_response(400, str(e))
@@ -5,4 +5,4 @@ from flask import Blueprint
 
 bp = Blueprint('api_v2_exchange_rate', __name__)
 
-from app.api.v2.exchange_rate import sbv, vcb, ctg, tcb, bid, stb  # This line must be after Blueprint
+from app.api.v2.exchange_rate import sbv, vcb, ctg, tcb, bid, stb, compare, history  # This line must be after Blueprint
@@ -0,0 +1,62 @@
+"""app/api/v2/exchange_rate/as_of.py
+
+Rates as of a point in time. Instead of sorting and grouping the whole
+history before the timestamp, every currency is resolved with its own
+``{currency: 1, datetime: -1}`` index seek, so the cost grows with the
+number of currencies and not with the length of the history.
+"""
+from app.api.v2.exchange_rate.get_query import get_projection
+from app.api.v2.exchange_rate.latest import latest_collection
+from app.db.executor import fan_out
+from app.helper.DateHelper import parse_date
+
+
+def end_of_day(date_param):
+    """Last instant of a YYYY-MM-DD date, raises ValueError on bad input"""
+    return parse_date(date_param).replace(hour=23, minute=59, second=59, microsecond=999999)
+
+
+def get_as_of_query(fields, currency, as_of):
+    """Newest row of one currency at or before as_of"""
+    return [
+        {
+            '$match': {
+                'currency': currency,
+                'datetime': {
+                    '$lte': as_of
+                }
+            }
+        }, {
+            '$sort': {
+                'datetime': -1
+            }
+        }, {
+            '$limit': 1
+        }, {
+            '$project': get_projection(fields)
+        }
+    ]
+
+
+def find_currencies(db, collection):
+    """Every currency ever published by a bank"""
+    currencies = db[latest_collection(collection)].distinct('_id')
+    if not currencies:
+        currencies = db[collection].distinct('currency')
+    return sorted(currencies)
+
+
+def seek_as_of(db, collection, fields, currency, as_of):
+    """Rate of one currency as of a datetime, None if it had none yet"""
+    return next(db[collection].aggregate(
+        get_as_of_query(fields, currency, as_of)), None)
+
+
+def find_as_of(db, collection, fields, as_of, currency=None):
+    """Rates of every currency (or of one currency) as of a datetime"""
+    currencies = [currency] if currency else find_currencies(db, collection)
+    rows = fan_out(
+        lambda code: seek_as_of(db, collection, fields, code, as_of),
+        currencies
+    )
+    return [row for row in rows if row is not None]
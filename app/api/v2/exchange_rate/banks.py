@@ -0,0 +1,17 @@
+"""app/api/v2/exchange_rate/banks.py"""
+from app.api.v2.exchange_rate import bid, ctg, sbv, stb, tcb, vcb
+
+# Rate fields published by every bank, keyed by the exchange_rate_<bank> suffix
+BANKS = {
+    'sbv': sbv.FIELDS,
+    'vcb': vcb.FIELDS,
+    'ctg': ctg.FIELDS,
+    'tcb': tcb.FIELDS,
+    'bid': bid.FIELDS,
+    'stb': stb.FIELDS
+}
+
+
+def bank_collection(bank):
+    """History collection of a bank"""
+    return 'exchange_rate_' + bank
@@ -0,0 +1,170 @@
+"""app/api/v2/exchange_rate/compare.py"""
+from flask import jsonify, make_response, request
+
+from app.api.auth import require_api_key
+from app.api.v2.exchange_rate import bp
+from app.api.v2.exchange_rate.as_of import end_of_day, find_currencies, seek_as_of
+from app.api.v2.exchange_rate.banks import BANKS, bank_collection
+from app.api.v2.exchange_rate.latest import get_latest
+from app.db.executor import fan_out
+from app.db.mongodb_connect import MongoDBConnect
+from app.errors import error_response
+
+SCOPE = 'exchange_rate'
+# Banks publishing reference rates nobody can trade at, never picked as best
+REFERENCE_BANKS = ('sbv',)
+
+
+def compare_rates(rows_by_bank):
+    """Bank x currency matrix with the best rate of every field.
+
+    The best buy rate is the highest one (the customer sells to the bank),
+    the best sell rate is the lowest one. Reference rates are listed but
+    never picked.
+    """
+    results = {}
+    for bank, rows in rows_by_bank.items():
+        for row in rows:
+            row = dict(row)
+            currency = row.pop('currency')
+            results.setdefault(currency, {'banks': {}, 'best': {}})
+            results[currency]['banks'][bank] = row
+
+    for currency in results.values():
+        for bank, row in currency['banks'].items():
+            if bank in REFERENCE_BANKS:
+                continue
+            for field, value in row.items():
+                if value is None:
+                    continue
+                best = currency['best'].get(field)
+                if best is None \
+                        or (field.startswith('buy') and value > best['value']) \
+                        or (field.startswith('sell') and value < best['value']):
+                    currency['best'][field] = {
+                        'bank': bank,
+                        'value': value
+                    }
+    return results
+
+
+@bp.route('/api/v2/exchange_rate/compare', methods=['GET'])
+@require_api_key(scope=SCOPE, permission=0)
+def api_v2_exchange_rate_compare_get():
+    """.. :quickref: 00. Compare; Compare exchange rate of all banks
+
+    This function allows users to compare the exchange rate of all banks in one request.
+    The reference rates of the State Bank (sbv) are listed but never marked as best.
+    Optionally, you can specify a comma separated list of currencies and/or a date.
+    If a date is specified and no data exists for that date, it will return the nearest previous date's data.
+
+    **Request**:
+
+    .. sourcecode:: http
+
+      GET /api/v2/exchange_rate/compare?currency=USD,EUR HTTP/1.1
+      Host: https://api.vnappmob.com
+      Accept: application/json
+
+      GET /api/v2/exchange_rate/compare?currency=USD&date=2024-01-15 HTTP/1.1
+      Host: https://api.vnappmob.com
+      Accept: application/json
+
+    **Response**:
+
+    .. sourcecode:: http
+
+      HTTP/1.1 200 OK
+      Vary: Accept
+      Content-Type: application/json
+
+      {
+          "results": {
+              "USD": {
+                  "banks": {
+                      "sbv": {
+                          "buy": 23400.00,
+                          "sell": 24000.00
+                      },
+                      "vcb": {
+                          "buy_cash": 23130.00,
+                          "buy_transfer": 23130.00,
+                          "sell": 23250.00
+                      }...
+                  },
+                  "best": {
+                      "buy_cash": {
+                          "bank": "vcb",
+                          "value": 23130.00
+                      },
+                      "sell": {
+                          "bank": "vcb",
+                          "value": 23250.00
+                      }...
+                  }
+              }...
+          }
+      }
+
+    :reqheader Authorization: Bearer <api_key|scope=exchange_rate|permission=0>
+    :queryparam currency: Optional comma separated currency codes (USD,EUR...), all currencies by default
+    :queryparam date: Optional date parameter in YYYY-MM-DD format. If no data exists for that date, returns the nearest previous date's data.
+    :resheader Content-Type: application/json
+    :status 200: OK
+    :status 400: Error
+    :status 403: Fail on authorization
+    """
+    try:
+        db_connect = MongoDBConnect()
+        db = db_connect.connection['vapi']
+
+        currency_param = request.args.get('currency')
+        currencies = set()
+        if currency_param:
+            currencies = {c.strip().upper() for c in currency_param.split(',') if c.strip()}
+
+        date_param = request.args.get('date')
+        if date_param:
+            try:
+                as_of = end_of_day(date_param)
+            except ValueError:
+                return error_response(400, 'Invalid date format. Use YYYY-MM-DD format.')
+
+            def bank_currencies(bank):
+                if currencies:
+                    return sorted(currencies)
+                return find_currencies(db, bank_collection(bank))
+
+            # One index seek per (bank, currency), all issued concurrently
+            seeks = [
+                (bank, currency)
+                for bank, currency_list in zip(BANKS, fan_out(bank_currencies, BANKS))
+                for currency in currency_list
+            ]
+            rows = fan_out(
+                lambda seek: seek_as_of(
+                    db, bank_collection(seek[0]), BANKS[seek[0]], seek[1], as_of),
+                seeks
+            )
+            rows_by_bank = {bank: [] for bank in BANKS}
+            for (bank, _), row in zip(seeks, rows):
+                if row is not None:
+                    rows_by_bank[bank].append(row)
+        else:
+            # Same per-worker cache as the per-bank routes
+            latest = fan_out(
+                lambda bank: get_latest(db, bank_collection(bank), BANKS[bank]),
+                BANKS
+            )
+            rows_by_bank = {
+                bank: [row for row in rows if not currencies or row['currency'] in currencies]
+                for bank, rows in zip(BANKS, latest)
+            }
+
+        responses = {
+            'results': compare_rates(rows_by_bank)
+        }
+
+        return make_response((jsonify(responses)), 200)
+    except Exception as e:
+        return error_response(400, str(e))
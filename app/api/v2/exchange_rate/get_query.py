@@ -0,0 +1,165 @@
+"""app/api/v2/exchange_rate/get_query.py"""
+from app.db.rollup import get_partial_days_match, get_rollup_days
+
+
+def get_query(fields, match_conditions=None):
+    """Latest row per currency computed from the full exchange rate history"""
+    query = []
+    if match_conditions:
+        query.append({
+            '$match': match_conditions
+        })
+
+    group = {
+        '_id': '$currency',
+        'datetime': {
+            '$first': '$datetime'
+        }
+    }
+    for field in fields:
+        group[field] = {
+            '$first': '$' + field
+        }
+
+    query.extend([
+        {
+            '$sort': {
+                'datetime': -1
+            }
+        }, {
+            '$group': group
+        }, {
+            '$sort': {
+                '_id': 1
+            }
+        }, {
+            '$project': get_projection(fields, currency='$_id')
+        }
+    ])
+    return query
+
+
+def get_projection(fields, currency='$currency'):
+    """Public shape of an exchange rate row"""
+    projection = {
+        '_id': False,
+        'currency': currency
+    }
+    for field in fields:
+        projection[field] = {
+            '$toDouble': '$' + field
+        }
+    return projection
+
+
+def get_history_query(fields, currency, date_from, date_to, interval, limit,
+                      timezone='UTC', daily=False, collection=None):
+    """Open/high/low/close of every field per interval bucket of one currency.
+
+    With daily=True the query runs on the daily rollup documents: they serve
+    the whole days of the range, and the ticks of the partial days at both
+    ends come from the tick collection through $unionWith, so the buckets
+    are the same as from the raw ticks.
+    """
+    date_field = 'date' if daily else 'datetime'
+    group = {
+        '_id': {
+            '$dateTrunc': {
+                'date': '$' + date_field,
+                'unit': interval,
+                'timezone': timezone,
+                'startOfWeek': 'monday'
+            }
+        }
+    }
+    projection = {
+        '_id': False,
+        'datetime': {
+            '$dateToString': {
+                'date': '$_id',
+                'format': '%Y-%m-%dT%H:%M:%S',
+                'timezone': timezone
+            }
+        },
+        'cursor': {
+            '$toLong': '$_id'
+        }
+    }
+    for field in fields:
+        for key, accumulator in (('open', '$first'), ('high', '$max'),
+                                 ('low', '$min'), ('close', '$last')):
+            group['%s_%s' % (field, key)] = {
+                accumulator: '$%s.%s' % (field, key) if daily else '$' + field
+            }
+        projection[field] = {
+            key: {
+                '$toDouble': '$%s_%s' % (field, key)
+            } for key in ('open', 'high', 'low', 'close')
+        }
+
+    if daily:
+        day_from, day_to = get_rollup_days(date_from, date_to, timezone)
+        # Ticks of the partial days, shaped like rollup documents
+        tick_projection = {
+            '_id': False,
+            'date': '$datetime'
+        }
+        for field in fields:
+            tick_projection[field] = {
+                key: '$' + field for key in ('open', 'high', 'low', 'close')
+            }
+        query = [
+            {
+                '$match': {
+                    'currency': currency,
+                    'date': {
+                        '$gte': day_from,
+                        '$lt': day_to
+                    }
+                }
+            }, {
+                '$unionWith': {
+                    'coll': collection,
+                    'pipeline': [
+                        {
+                            '$match': dict(
+                                get_partial_days_match(date_from, date_to, day_from, day_to),
+                                currency=currency
+                            )
+                        }, {
+                            '$project': tick_projection
+                        }
+                    ]
+                }
+            }
+        ]
+    else:
+        query = [
+            {
+                '$match': {
+                    'currency': currency,
+                    'datetime': {
+                        '$gte': date_from,
+                        '$lt': date_to
+                    }
+                }
+            }
+        ]
+
+    return query + [
+        {
+            '$sort': {
+                date_field: 1
+            }
+        }, {
+            '$group': group
+        }, {
+            '$sort': {
+                '_id': 1
+            }
+        }, {
+            '$limit': limit
+        }, {
+            '$project': projection
+        }
+    ]
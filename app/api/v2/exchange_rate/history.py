@@ -0,0 +1,135 @@
+"""app/api/v2/exchange_rate/history.py"""
+import datetime
+
+from flask import current_app, jsonify, make_response, request
+
+from app.api.auth import require_api_key
+from app.api.v2.exchange_rate import bp
+from app.api.v2.exchange_rate.banks import BANKS, bank_collection
+from app.api.v2.exchange_rate.get_query import get_history_query
+from app.db.mongodb_connect import MongoDBConnect
+from app.db.rollup import daily_collection, is_backfilled
+from app.errors import error_response
+from app.helper.DateHelper import get_date_range
+
+SCOPE = 'exchange_rate'
+INTERVALS = ('hour', 'day', 'week', 'month')
+
+
+@bp.route('/api/v2/exchange_rate/<string:bank>/history', methods=['GET'])
+@require_api_key(scope=SCOPE, permission=0)
+def api_v2_exchange_rate_history_get(bank):
+    """.. :quickref: 00. History; Get exchange rate history of a currency
+
+    This function allows users to get the open, high, low and close exchange rate
+    of a currency per hour, day, week or month.
+    At most HISTORY_MAX_POINTS buckets are returned per request, use ``next_cursor``
+    to fetch the following page.
+
+    **Request**:
+
+    .. sourcecode:: http
+
+      GET /api/v2/exchange_rate/vcb/history?currency=USD&from=2024-01-01&to=2024-12-31&interval=day HTTP/1.1
+      Host: https://api.vnappmob.com
+      Accept: application/json
+
+    **Response**:
+
+    .. sourcecode:: http
+
+      HTTP/1.1 200 OK
+      Vary: Accept
+      Content-Type: application/json
+
+      {
+          "results": [
+              {
+                  "datetime": "2024-01-01T00:00:00",
+                  "buy_cash": {
+                      "open": 24020.00,
+                      "high": 24080.00,
+                      "low": 24020.00,
+                      "close": 24060.00
+                  },
+                  "buy_transfer": {...},
+                  "sell": {...}
+              }...
+          ],
+          "next_cursor": 1711929600000
+      }
+
+    :reqheader Authorization: Bearer <api_key|scope=exchange_rate|permission=0>
+    :queryparam currency: Currency code (3 chars: USD, EUR, etc.)
+    :queryparam from: Optional first date in YYYY-MM-DD format, the 30 days ending with ``to`` by default
+    :queryparam to: Optional last date (included) in YYYY-MM-DD format, today by default
+    :queryparam interval: Optional bucket size: hour, day (default), week or month
+    :queryparam limit: Optional maximum number of buckets, capped by HISTORY_MAX_POINTS
+    :queryparam cursor: Optional ``next_cursor`` of the previous page
+    :resheader Content-Type: application/json
+    :status 200: OK
+    :status 400: Error
+    :status 403: Fail on authorization
+    :status 404: Unknown bank
+    """
+    try:
+        if bank not in BANKS:
+            return error_response(404, 'Unknown bank: %s' % bank)
+
+        currency_param = request.args.get('currency')
+        if not currency_param:
+            return error_response(400, 'Missing currency parameter.')
+
+        interval = request.args.get('interval', default='day')
+        if interval not in INTERVALS:
+            return error_response(400, 'Invalid interval. Use one of: %s.' % ', '.join(INTERVALS))
+
+        try:
+            date_from, date_to = get_date_range(request.args, 30)
+        except ValueError:
+            return error_response(400, 'Invalid date format. Use YYYY-MM-DD format.')
+
+        cursor = request.args.get('cursor', type=int)
+        if cursor:
+            # Cursors are bucket starts in epoch milliseconds
+            date_from = max(date_from, datetime.datetime.fromtimestamp(
+                cursor / 1000, datetime.timezone.utc).replace(tzinfo=None))
+
+        max_points = current_app.config.get('HISTORY_MAX_POINTS', 1000)
+        limit = max(1, min(request.args.get('limit', default=max_points, type=int), max_points))
+
+        db_connect = MongoDBConnect()
+        db = db_connect.connection['vapi']
+        timezone = current_app.config.get('BUCKET_TIMEZONE', 'UTC')
+        collection = bank_collection(bank)
+
+        # Daily rollups are kept current by the POST handlers, so only hourly
+        # buckets (or a rollup that was never backfilled) need the raw ticks
+        daily = interval != 'hour' and is_backfilled(db, collection)
+
+        q_res = db[daily_collection(collection) if daily else collection].aggregate(
+            get_history_query(
+                BANKS[bank], currency_param.upper(), date_from, date_to,
+                interval, limit + 1,
+                timezone=timezone,
+                daily=daily,
+                collection=collection
+            )
+        )
+
+        results = list(q_res)
+        next_cursor = None
+        if len(results) > limit:
+            next_cursor = results[limit]['cursor']
+            results = results[:limit]
+        for result in results:
+            result.pop('cursor')
+
+        responses = {
+            'results': results,
+            'next_cursor': next_cursor
+        }
+
+        return make_response((jsonify(responses)), 200)
+    except Exception as e:
+        return error_response(400, str(e))
@@ -0,0 +1,107 @@
+"""app/api/v2/exchange_rate/ingest.py"""
+import datetime
+import logging
+
+from flask import current_app
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from app.api.v2.exchange_rate.latest import find_latest, update_latest
+from app.db.cache import current_hash, get_content_hash, store_hash
+from app.db.rollup import update_rollup
+
+INSERTED = 'inserted'
+UNCHANGED = 'unchanged'
+FAILED = 'failed'
+
+logger = logging.getLogger(__name__)  # pylint: disable=C
+
+
+def ingest(db, collection, fields, post_datas):
+    """Store the posted rates that changed since the latest snapshot.
+
+    A push identical to the previous one is recognised by its content hash
+    with a single point read. Otherwise the rates are diffed per currency
+    against the latest snapshot and all changed currencies are written with
+    one unordered bulk write, so a failing row does not stop the others.
+    Returns the status of every posted currency and the error message of
+    the failed ones.
+    """
+    post_dict = {}
+    for data in post_datas:
+        data = dict(data)
+        post_dict[data.pop('currency')] = data
+
+    content_hash = get_content_hash(post_dict)
+    if current_hash(db, collection) == content_hash:
+        return {k: UNCHANGED for k in post_dict}, {}
+
+    current_dict = {}
+    for data in find_latest(db, collection, fields):
+        current_dict[data.pop('currency')] = data
+
+    now = datetime.datetime.now()
+    statuses = {}
+    errors = {}
+    new_docs = []
+
+    for k, v in post_dict.items():
+        if k in current_dict and v == current_dict[k]:
+            statuses[k] = UNCHANGED
+            continue
+        new_doc = {
+            "datetime": now,
+            "currency": k
+        }
+        new_doc.update(v)
+        new_docs.append(new_doc)
+
+    if not new_docs:
+        store_hash(db, collection, content_hash)
+        return statuses, errors
+
+    try:
+        db[collection].bulk_write(
+            [InsertOne(dict(doc)) for doc in new_docs],
+            ordered=False
+        )
+    except BulkWriteError as e:
+        for error in e.details.get('writeErrors', []):
+            errors[new_docs[error['index']]['currency']] = error.get('errmsg')
+
+    inserted = [doc for doc in new_docs if doc['currency'] not in errors]
+    for doc in new_docs:
+        statuses[doc['currency']] = FAILED if doc['currency'] in errors else INSERTED
+
+    # After a partial failure the snapshot matches no single push, so the
+    # hash is removed and the next push, even a repeat, is diffed
+    update_latest(
+        db, collection, inserted,
+        content_hash=None if errors else content_hash
+    )
+    # The history is written, a failed rollup update is repaired by
+    # flask vapi rollup-backfill
+    try:
+        update_rollup(
+            db, collection, inserted,
+            timezone=current_app.config.get('BUCKET_TIMEZONE', 'UTC'),
+            by_currency=True
+        )
+    except PyMongoError as e:
+        logger.warning('rollup update of %s failed: %s', collection, e)
+    return statuses, errors
+
+
+def ingest_response(statuses, errors):
+    """Response body and status code of a POST"""
+    responses = {
+        'results': 200,
+        'currencies': statuses
+    }
+    if errors:
+        responses['errors'] = errors
+    if INSERTED in statuses.values():
+        responses['results'] = 201
+    elif errors:
+        responses['results'] = 400
+    return responses, responses['results']
@@ -0,0 +1,111 @@
+"""app/api/v2/exchange_rate/latest.py
+
+Every ``exchange_rate_<bank>`` history collection has a companion
+``exchange_rate_<bank>_latest`` collection holding exactly one document per
+currency (``_id`` is the currency code). POST handlers keep it up to date so
+the latest rates are read without scanning the history.
+"""
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.api.v2.exchange_rate.get_query import get_projection, get_query
+from app.db.cache import bump_version, cache
+
+
+def latest_collection(collection):
+    """Name of the latest snapshot collection of a history collection"""
+    return collection + '_latest'
+
+
+def rebuild_latest(db, collection, fields):
+    """Rebuild the latest snapshot from the full history"""
+    query = get_query(fields)[:-1]
+    query.extend([
+        {
+            '$addFields': {
+                'currency': '$_id'
+            }
+        }, {
+            '$merge': {
+                'into': latest_collection(collection),
+                'whenMatched': 'replace',
+                'whenNotMatched': 'insert'
+            }
+        }
+    ])
+    list(db[collection].aggregate(query))
+
+
+def get_latest_query(fields, currency=None):
+    """Pipeline reading the latest snapshot, sorted by currency"""
+    match_conditions = {}
+    if currency:
+        match_conditions['_id'] = currency
+
+    return [
+        {
+            '$match': match_conditions
+        }, {
+            '$sort': {
+                '_id': 1
+            }
+        }, {
+            '$project': get_projection(fields, currency='$_id')
+        }
+    ]
+
+
+def find_latest(db, collection, fields, currency=None):
+    """Latest rate of every currency (or of one currency), sorted by currency"""
+    query = get_latest_query(fields, currency)
+
+    latest = db[latest_collection(collection)]
+    results = list(latest.aggregate(query))
+    if not results and latest.estimated_document_count() == 0:
+        # First read after deploy: seed the snapshot from the history once
+        rebuild_latest(db, collection, fields)
+        results = list(latest.aggregate(query))
+    return results
+
+
+def get_latest(db, collection, fields):
+    """find_latest() for all currencies, served from the per-worker cache"""
+    return cache.get(
+        db, collection,
+        lambda: find_latest(db, collection, fields)
+    )
+
+
+def update_latest(db, collection, docs, content_hash=None):
+    """Upsert the newest row of each currency into the latest snapshot.
+
+    A row only replaces a snapshot row that is not newer than itself, so an
+    overlapping older push cannot overwrite it. The upsert of such a row
+    collides with the existing _id, which is ignored. content_hash is only
+    recorded when every row was applied; otherwise the stored hash is
+    removed, since the snapshot no longer matches any single push.
+    """
+    if not docs:
+        return None
+
+    try:
+        result = db[latest_collection(collection)].bulk_write([
+            UpdateOne(
+                {
+                    '_id': doc['currency'],
+                    'datetime': {
+                        '$lte': doc['datetime']
+                    }
+                },
+                {'$set': doc},
+                upsert=True
+            ) for doc in docs
+        ], ordered=False)
+    except BulkWriteError as e:
+        # Rows written before the failure are visible, so invalidate anyway
+        bump_version(db, collection)
+        if any(error.get('code') != 11000 for error in e.details.get('writeErrors', [])):
+            raise
+        return None
+    bump_version(db, collection, content_hash=content_hash)
+    return result
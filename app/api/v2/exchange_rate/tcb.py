@@ -8,10 +8,14 @@ from flask import Blueprint, current_app, jsonify, make_response, request
 
 from app.api.auth import require_api_key
 from app.api.v2.exchange_rate import bp
+from app.api.v2.exchange_rate.as_of import end_of_day, find_as_of
+from app.api.v2.exchange_rate.ingest import ingest, ingest_response
+from app.api.v2.exchange_rate.latest import find_latest, get_latest
 from app.db.mongodb_connect import MongoDBConnect
 from app.errors import error_response
 
 SCOPE = 'exchange_rate'
+FIELDS = ['sell', 'buy_cash', 'buy_transfer']
 
 
 @bp.route('/api/v2/exchange_rate/tcb', methods=['GET'])
@@ -78,87 +82,25 @@ def api_v2_exchange_rate_tcb_get():
     """
     try:
         db_connect = MongoDBConnect()
+        db = db_connect.connection['vapi']
         collection = 'exchange_rate_tcb'
 
-        # Build aggregation pipeline
-        pipeline = []
-
-        # Build match filter conditions
-        match_conditions = {}
-
-        # Add date filter if date parameter is provided
         date_param = request.args.get('date')
+        currency_param = request.args.get('currency')
+        currency = currency_param.upper() if currency_param else None
+
         if date_param:
             try:
-                # Parse the date string (YYYY-MM-DD format)
-                query_date = datetime.datetime.strptime(date_param, '%Y-%m-%d')
-                # Use end of day as upper bound to include all data up to and including the specified date
-                # This allows finding the nearest previous date's data if no data exists on the specified date
-                end_of_day = query_date.replace(hour=23, minute=59, second=59, microsecond=999999)
-                
-                match_conditions['datetime'] = {
-                    '$lte': end_of_day
-                }
+                # Use end of day as upper bound so that a date without data
+                # returns the nearest previous date's data
+                as_of = end_of_day(date_param)
             except ValueError:
                 return error_response(400, 'Invalid date format. Use YYYY-MM-DD format.')
-
-        # Add currency filter if currency parameter is provided
-        currency_param = request.args.get('currency')
-        if currency_param:
-            match_conditions['currency'] = currency_param.upper()
-
-        # Add match stage if any filters are provided
-        if match_conditions:
-            pipeline.append({
-                '$match': match_conditions
-            })
-
-        # Add sorting, grouping, and projection stages
-        pipeline.extend([
-            {
-                '$sort': {
-                    'datetime': -1
-                }
-            }, {
-                '$group': {
-                    '_id': '$currency',
-                    'datetime': {
-                        '$first': '$datetime'
-                    },
-                    'sell': {
-                        '$first': '$sell'
-                    },
-                    'buy_cash': {
-                        '$first': '$buy_cash'
-                    },
-                    'buy_transfer': {
-                        '$first': '$buy_transfer'
-                    }
-                }
-            }, {
-                '$sort': {
-                    '_id': 1
-                }
-            }, {
-                '$project': {
-                    '_id': False,
-                    'currency': '$_id',
-                    'sell': {
-                        '$toDouble': '$sell'
-                    },
-                    'buy_cash': {
-                        '$toDouble': '$buy_cash'
-                    },
-                    'buy_transfer': {
-                        '$toDouble': '$buy_transfer'
-                    },
-                }
-            }
-        ])
-
-        q_res = db_connect.connection['vapi'][collection].aggregate(pipeline)
-
-        results = list(q_res)
+            results = find_as_of(db, collection, FIELDS, as_of, currency=currency)
+        elif currency:
+            results = find_latest(db, collection, FIELDS, currency=currency)
+        else:
+            results = get_latest(db, collection, FIELDS)
 
         responses = {
             'results': results
@@ -167,8 +109,6 @@ def api_v2_exchange_rate_tcb_get():
         return make_response((jsonify(responses)), 200)
     except Exception as e:
         return error_response(400, str(e))
-    finally:
-        db_connect.connection.close()
 
 
 @bp.route('/api/v2/exchange_rate/tcb', methods=['POST'])
@@ -192,6 +132,15 @@ def api_v2_exchange_rate_tcb_post():
 
       HTTP/1.1 201 Created
       Vary: Accept
+      Content-Type: application/json
+
+      {
+          "results": 201,
+          "currencies": {
+              "EUR": "unchanged",
+              "USD": "inserted"
+          }
+      }
 
     :reqheader Authorization: Bearer <api_key|scope=exchange_rate|permission=1>
     :reqheader Content-Type: application/json
@@ -200,81 +149,23 @@ def api_v2_exchange_rate_tcb_post():
     :<json float buy_cash: buy_cash
     :<json float buy_transfer: buy_transfer
     :<json float sell: sell
+    :>json int results: 201 if any currency was inserted, 200 if nothing changed, 400 if every write failed
+    :>json json currencies: inserted, unchanged or failed for every posted currency
+    :>json json errors: error message of every failed currency, if any
     :status 201: Successful
+    :status 200: Nothing changed
     :status 400: Error
     :status 403: Fail on authorization
     """
     try:
         db_connect = MongoDBConnect()
+        db = db_connect.connection['vapi']
         collection = 'exchange_rate_tcb'
         json_data = request.get_json()
 
-        q_res = db_connect.connection['vapi'][collection].aggregate([
-            {
-                '$sort': {
-                    'datetime': -1
-                }
-            }, {
-                '$group': {
-                    '_id': '$currency',
-                    'datetime': {
-                        '$first': '$datetime'
-                    },
-                    'sell': {
-                        '$first': '$sell'
-                    },
-                    'buy_cash': {
-                        '$first': '$buy_cash'
-                    },
-                    'buy_transfer': {
-                        '$first': '$buy_transfer'
-                    }
-                }
-            }, {
-                '$sort': {
-                    '_id': 1
-                }
-            }, {
-                '$project': {
-                    '_id': False,
-                    'currency': '$_id',
-                    'sell': {
-                        '$toDouble': '$sell'
-                    },
-                    'buy_cash': {
-                        '$toDouble': '$buy_cash'
-                    },
-                    'buy_transfer': {
-                        '$toDouble': '$buy_transfer'
-                    },
-                }
-            }
-        ])
-
-        post_dict = {}
-        for data in json_data['post_datas']:
-            post_dict[data.pop('currency')] = data
-
-        current_dict = {}
-        for data in q_res:
-            current_dict[data.pop('currency')] = data
-
-        changed = False
-
-        for k, v in post_dict.items():
-            if k not in current_dict or post_dict[k] != current_dict[k]:
-                changed = True
-                new_doc = {
-                    "datetime": datetime.datetime.now(),
-                    "currency": k
-                }
-                new_doc.update(v)
-                db_connect.connection['vapi'][collection].insert_one(new_doc)
-
-        if changed:
-            return make_response((jsonify({'results': 201})), 201)
-        return make_response((jsonify({'results': 200})), 200)
+        statuses, errors = ingest(db, collection, FIELDS, json_data['post_datas'])
+        responses, status_code = ingest_response(statuses, errors)
+
+        return make_response((jsonify(responses)), status_code)
     except Exception as e:
         return error_response(400, str(e))
-    finally:
-        db_connect.connection.close()
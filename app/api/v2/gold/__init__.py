@@ -5,5 +5,5 @@ from flask import Blueprint
 
 bp = Blueprint('api_v2_gold', __name__)
 
-from app.api.v2.gold import sjc, doji, pnj  # This line must be after Blueprint
+from app.api.v2.gold import sjc, doji, pnj, all_vendors, stats  # This line must be after Blueprint
 
@@ -0,0 +1,101 @@
+"""app/api/v2/gold/all_vendors.py"""
+import datetime as dt
+
+from flask import current_app, jsonify, make_response, request
+
+from app.api.auth import require_api_key
+from app.api.v2.gold import bp
+from app.api.v2.gold.get_query import INTERVALS, get_range_query
+from app.api.v2.gold.latest import get_latest_results
+from app.api.v2.gold.vendors import VENDORS, vendor_collection
+from app.db.executor import fan_out
+from app.db.mongodb_connect import MongoDBConnect
+from app.errors import error_response
+
+SCOPE = 'gold'
+
+
+@bp.route('/api/v2/gold/all', methods=['GET'])
+@require_api_key(scope=SCOPE, permission=0)
+def api_v2_gold_all_get():
+    """.. :quickref: 00. All Prices; Get SJC, DOJI and PNJ Gold Price
+
+    This function allows users to get the latest gold price of every vendor
+    in one request
+
+    **Request**:
+
+    .. sourcecode:: http
+
+      GET /api/v2/gold/all HTTP/1.1
+      Host: https://api.vnappmob.com
+      Accept: application/json
+
+    **Response**:
+
+    .. sourcecode:: http
+
+      HTTP/1.1 200 OK
+      Vary: Accept
+      Content-Type: application/json
+
+      {
+          "results": {
+              "sjc": [
+                  {
+                      "buy_1l": 42550000.00,
+                      "sell_1l": 42550000.00
+                  }...
+              ],
+              "doji": [...],
+              "pnj": [...]
+          }
+      }
+
+    :query date_from: Set date from query
+    :query date_to: Set date to query
+    :query interval: Optional bucket size of a date range: hour, day (default), week or month.
+        Every bucket holds its last price.
+    :reqheader Authorization: Bearer <api_key|scope=gold|permission=0>
+    :resheader Content-Type: application/json
+    :status 200: OK
+    :status 400: Error
+    :status 403: Fail on authorization
+    """
+    try:
+        db_connect = MongoDBConnect()
+        db = db_connect.connection['vapi']
+        date_from = request.args.get('date_from', default=0, type=int)
+        date_to = request.args.get('date_to', default=0, type=int)
+        interval = request.args.get('interval', default='day')
+        if interval not in INTERVALS:
+            return error_response(400, 'Invalid interval. Use one of: %s.' % ', '.join(INTERVALS))
+
+        if date_from != 0 and date_to != 0 and date_from < date_to:
+            timezone = current_app.config.get('BUCKET_TIMEZONE', 'UTC')
+
+            def find_range(vendor):
+                collection, query = get_range_query(
+                    db, vendor_collection(vendor),
+                    date_from=dt.datetime.fromtimestamp(date_from),
+                    date_to=dt.datetime.fromtimestamp(date_to),
+                    interval=interval,
+                    timezone=timezone
+                )
+                return list(db[collection].aggregate(query))
+
+            results = fan_out(find_range, VENDORS)
+        else:
+            # Same per-worker cache as the per-vendor routes
+            results = fan_out(
+                lambda vendor: get_latest_results(db, vendor_collection(vendor)),
+                VENDORS
+            )
+
+        responses = {
+            'results': dict(zip(VENDORS, results))
+        }
+
+        return make_response((jsonify(responses)), 200)
+    except Exception as e:
+        return error_response(400, str(e))
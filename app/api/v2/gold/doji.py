@@ -3,12 +3,13 @@ import datetime as dt
 import os
 
 import requests
-from bson.decimal128 import Decimal128
 from flask import Blueprint, current_app, jsonify, make_response, request
 
 from app.api.auth import require_api_key
 from app.api.v2.gold import bp
-from app.api.v2.gold.get_query import get_query
+from app.api.v2.gold.get_query import INTERVALS, get_range_query
+from app.api.v2.gold.ingest import ingest
+from app.api.v2.gold.latest import get_latest
 from app.db.mongodb_connect import MongoDBConnect
 from app.errors import error_response
 
@@ -49,6 +50,8 @@ def api_v2_gold_doji_get():
 
     :query date_from: Set date from query
     :query date_to: Set date to query
+    :query interval: Optional bucket size of a date range: hour, day (default), week or month.
+        Every bucket holds its last price.
     :reqheader Authorization: Bearer <api_key|scope=gold|permission=0>
     :resheader Content-Type: application/json
     :status 200: OK
@@ -57,30 +60,29 @@ def api_v2_gold_doji_get():
     """
     try:
         db_connect = MongoDBConnect()
+        db = db_connect.connection['vapi']
         collection = 'gold_doji'
         date_from = request.args.get('date_from', default=0, type=int)
         date_to = request.args.get('date_to', default=0, type=int)
+        interval = request.args.get('interval', default='day')
+        if interval not in INTERVALS:
+            return error_response(400, 'Invalid interval. Use one of: %s.' % ', '.join(INTERVALS))
 
         if date_from != 0 and date_to != 0 and date_from < date_to:
-            query = get_query(
-                type=1,
+            collection, query = get_range_query(
+                db, collection,
                 date_from=dt.datetime.fromtimestamp(date_from),
-                date_to=dt.datetime.fromtimestamp(date_to)
+                date_to=dt.datetime.fromtimestamp(date_to),
+                interval=interval,
+                timezone=current_app.config.get('BUCKET_TIMEZONE', 'UTC')
             )
         else:
-            query = get_query(type=0)
+            return make_response((get_latest(db, collection), 200,
+                                  {'Content-Type': 'application/json'}))
 
-        q_res = db_connect.connection['vapi'][collection].aggregate(query)
+        q_res = db[collection].aggregate(query)
 
-        results = []
-        for result in q_res:
-            result.pop('_id', None)
-            result['datetime'] = result['datetime'].strftime("%s")
-            for k, v in result.items():
-                if type(v) is Decimal128:
-                    result[k] = Decimal128.to_decimal(v)
-
-            results.append(result)
+        results = list(q_res)
 
         responses = {
             'results': results
@@ -89,8 +91,6 @@ def api_v2_gold_doji_get():
         return make_response((jsonify(responses)), 200)
     except Exception as e:
         return error_response(400, str(e))
-    finally:
-        db_connect.connection.close()
 
 
 @bp.route('/api/v2/gold/doji', methods=['POST'])
@@ -131,30 +131,8 @@ def api_v2_gold_doji_post():
         fcm = request.args.get('fcm', default=0, type=int)
         json_data = request.get_json()
 
-        sort = list({
-            'datetime': -1
-        }.items())
-        last_row = db_connect.connection['vapi'][collection].find_one(
-            sort=sort
-        )
-        changed = False
-
-        for k, v in json_data.items():
-            if type(v) is float:
-                json_data[k] = Decimal128(str(v))
-
-            if k not in last_row:
-                changed = True
-            elif (last_row[k]) != json_data[k]:
-                changed = True
-
-        if changed:
-            json_data['datetime'] = dt.datetime.now()
-            db_connect.connection['vapi'][collection].insert_one(json_data)
-
+        if ingest(db_connect.connection['vapi'], collection, json_data):
             return make_response((jsonify({'results': 201})), 201)
         return make_response((jsonify({'results': 200})), 200)
     except Exception as e:
         return error_response(400, str(e))
-    finally:
-        db_connect.connection.close()
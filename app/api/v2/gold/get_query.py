@@ -1,6 +1,135 @@
 
 import datetime as dt
 
+from app.db.rollup import daily_collection, get_partial_days_match, get_rollup_days, is_backfilled
+from app.helper.DateHelper import get_local_timezone
+
+INTERVALS = ('hour', 'day', 'week', 'month')
+
+
+def get_epoch(date_field):
+    """Epoch seconds of a naive local datetime, as a string like strftime("%s")"""
+    return {
+        '$toString': {
+            '$toLong': {
+                '$divide': [
+                    {
+                        '$toLong': {
+                            '$let': {
+                                'vars': {
+                                    'parts': {'$dateToParts': {'date': date_field}}
+                                },
+                                'in': {
+                                    '$dateFromParts': {
+                                        'year': '$$parts.year',
+                                        'month': '$$parts.month',
+                                        'day': '$$parts.day',
+                                        'hour': '$$parts.hour',
+                                        'minute': '$$parts.minute',
+                                        'second': '$$parts.second',
+                                        'millisecond': '$$parts.millisecond',
+                                        'timezone': get_local_timezone()
+                                    }
+                                }
+                            }
+                        }
+                    },
+                    1000
+                ]
+            }
+        }
+    }
+
+
+def get_projection():
+    """Public shape of a gold price document, computed by the server.
+
+    Drops ``_id``, turns ``datetime`` into epoch seconds (as a string, like
+    ``strftime("%s")`` on the naive local datetime) and Decimal128 prices
+    into doubles, so results can be serialized without touching them.
+    """
+    return {
+        '$replaceRoot': {
+            'newRoot': {
+                '$arrayToObject': {
+                    '$map': {
+                        'input': {
+                            '$filter': {
+                                'input': {
+                                    '$objectToArray': '$$ROOT'
+                                },
+                                'cond': {
+                                    '$ne': ['$$this.k', '_id']
+                                }
+                            }
+                        },
+                        'in': {
+                            'k': '$$this.k',
+                            'v': {
+                                '$switch': {
+                                    'branches': [
+                                        {
+                                            'case': {
+                                                '$eq': ['$$this.k', 'datetime']
+                                            },
+                                            'then': get_epoch('$$this.v')
+                                        }, {
+                                            'case': {
+                                                '$eq': [{'$type': '$$this.v'}, 'decimal']
+                                            },
+                                            'then': {
+                                                '$toDouble': '$$this.v'
+                                            }
+                                        }
+                                    ],
+                                    'default': '$$this.v'
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    }
+
+
+def get_bucket(date_field, interval='day', timezone='UTC', **kwargs):
+    """Start of the calendar interval a date belongs to"""
+    return {
+        '$dateTrunc': {
+            'date': date_field,
+            'unit': interval,
+            'timezone': timezone,
+            'startOfWeek': 'monday'
+        }
+    }
+
+
+def get_last_per_bucket(**kwargs):
+    """Stages keeping the last price of every interval bucket"""
+    return [
+        {
+            '$sort': {
+                'datetime': 1
+            }
+        }, {
+            '$group': {
+                '_id': get_bucket('$datetime', **kwargs),
+                'temp_data': {
+                    '$last': '$$ROOT'
+                }
+            }
+        }, {
+            '$sort': {
+                '_id': 1
+            }
+        }, {
+            '$replaceRoot': {
+                'newRoot': '$temp_data'
+            }
+        }
+    ]
+
 
 def get_query(type=0, **kwargs):
     query = False
@@ -15,6 +144,7 @@ def get_query(type=0, **kwargs):
             }
         ]
     elif type == 1:
+        # Last price of every interval bucket, straight from the ticks
         dnow = dt.datetime.now()
         date_from = kwargs['date_from'] if 'date_from' in kwargs else dnow - \
             dt.timedelta(30)
@@ -27,23 +157,171 @@ def get_query(type=0, **kwargs):
                         '$lt': date_to
                     }
                 }
-            }, {
-                '$group': {
-                    '_id': {
-                        '$dayOfYear': '$datetime'
-                    },
-                    'temp_data': {
-                        '$first': '$$ROOT'
+            }
+        ] + get_last_per_bucket(**kwargs)
+    elif type == 2:
+        # Closing price of the whole days from the daily rollup documents,
+        # the partial days at both ends from the ticks of kwargs['collection'],
+        # so the buckets are the same as with type 1
+        date_from = kwargs['date_from']
+        date_to = kwargs['date_to']
+        day_from, day_to = get_rollup_days(
+            date_from, date_to, kwargs.get('timezone', 'UTC'))
+        query = [
+            {
+                '$match': {
+                    'date': {
+                        '$gte': day_from,
+                        '$lt': day_to
                     }
                 }
             }, {
-                '$sort': {
-                    '_id': 1
+                '$replaceRoot': {
+                    'newRoot': {
+                        '$mergeObjects': [
+                            {
+                                '$arrayToObject': {
+                                    '$map': {
+                                        'input': {
+                                            '$filter': {
+                                                'input': {
+                                                    '$objectToArray': '$$ROOT'
+                                                },
+                                                'cond': {
+                                                    '$eq': [{'$type': '$$this.v'}, 'object']
+                                                }
+                                            }
+                                        },
+                                        'in': {
+                                            'k': '$$this.k',
+                                            'v': '$$this.v.close'
+                                        }
+                                    }
+                                }
+                            }, {
+                                'datetime': '$last'
+                            }
+                        ]
+                    }
                 }
             }, {
-                '$replaceRoot': {
-                    'newRoot': '$temp_data'
+                '$unionWith': {
+                    'coll': kwargs['collection'],
+                    'pipeline': [
+                        {
+                            '$match': get_partial_days_match(
+                                date_from, date_to, day_from, day_to)
+                        }
+                    ]
                 }
             }
-        ]
+        ] + get_last_per_bucket(**kwargs)
+    if query:
+        query.append(get_projection())
     return query
+
+
+def get_range_query(db, collection, date_from, date_to, interval='day', timezone='UTC'):
+    """Collection and query of a date range, from the daily rollup once backfilled.
+
+    Hourly buckets always need the raw ticks.
+    """
+    if interval != 'hour' and is_backfilled(db, collection):
+        return daily_collection(collection), get_query(
+            type=2,
+            collection=collection,
+            date_from=date_from,
+            date_to=date_to,
+            interval=interval,
+            timezone=timezone
+        )
+    return collection, get_query(
+        type=1,
+        date_from=date_from,
+        date_to=date_to,
+        interval=interval,
+        timezone=timezone
+    )
+
+
+def get_stats_query(fields, date_from, date_to):
+    """Summary of every field over a date range, in a single $group.
+
+    Every buy_<x> field with a matching sell_<x> field also gets the
+    statistics of its spread (sell - buy).
+    """
+    group = {
+        '_id': None,
+        'count': {'$sum': 1},
+        'datetime_first': {'$first': '$datetime'},
+        'datetime_last': {'$last': '$datetime'}
+    }
+    projection = {
+        '_id': False,
+        'count': True,
+        'datetime_first': get_epoch('$datetime_first'),
+        'datetime_last': get_epoch('$datetime_last'),
+        'fields': {},
+        'spreads': {}
+    }
+    for field in fields:
+        for key, accumulator in (('min', '$min'), ('max', '$max'), ('avg', '$avg'),
+                                 ('first', '$first'), ('last', '$last')):
+            group['%s_%s' % (field, key)] = {accumulator: '$' + field}
+        projection['fields'][field] = {
+            key: {
+                '$toDouble': '$%s_%s' % (field, key)
+            } for key in ('min', 'max', 'avg', 'first', 'last')
+        }
+        projection['fields'][field]['change_percent'] = {
+            '$cond': [
+                {'$in': ['$%s_first' % field, [0, None]]},
+                None,
+                {
+                    '$toDouble': {
+                        '$multiply': [
+                            {
+                                '$divide': [
+                                    {'$subtract': ['$%s_last' % field, '$%s_first' % field]},
+                                    '$%s_first' % field
+                                ]
+                            },
+                            100
+                        ]
+                    }
+                }
+            ]
+        }
+
+    for field in fields:
+        if not field.startswith('buy_') or 'sell_' + field[4:] not in fields:
+            continue
+        spread = field[4:]
+        for key, accumulator in (('min', '$min'), ('max', '$max'), ('avg', '$avg')):
+            group['spread_%s_%s' % (spread, key)] = {
+                accumulator: {'$subtract': ['$sell_' + spread, '$' + field]}
+            }
+        projection['spreads'][spread] = {
+            key: {
+                '$toDouble': '$spread_%s_%s' % (spread, key)
+            } for key in ('min', 'max', 'avg')
+        }
+
+    return [
+        {
+            '$match': {
+                'datetime': {
+                    '$gte': date_from,
+                    '$lt': date_to
+                }
+            }
+        }, {
+            '$sort': {
+                'datetime': 1
+            }
+        }, {
+            '$group': group
+        }, {
+            '$project': projection
+        }
+    ]
@@ -0,0 +1,51 @@
+"""app/api/v2/gold/ingest.py"""
+import datetime as dt
+import logging
+
+from bson.decimal128 import Decimal128
+from flask import current_app
+from pymongo.errors import PyMongoError
+
+from app.api.v2.gold.latest import put_latest, restore_latest, swap_latest
+from app.db.rollup import update_rollup
+
+logger = logging.getLogger(__name__)  # pylint: disable=C
+
+
+def ingest(db, collection, json_data):
+    """Store a posted gold price if it differs from the latest one.
+
+    Whether the price changed is decided by one conditional write on the
+    vendor's snapshot document, so concurrent identical pushes are absorbed
+    by the server and only one of them is inserted. An unchanged push costs
+    that single round trip. A changed one still needs the insert after it,
+    two sequential round trips like a find_one and insert_one, followed by
+    the rollup update. If the insert fails the snapshot is restored, so a
+    retry is not taken for unchanged, and the rollup is left untouched.
+    Returns True if inserted.
+    """
+    for k, v in json_data.items():
+        if type(v) is float:
+            json_data[k] = Decimal128(str(v))
+    json_data['datetime'] = dt.datetime.now()
+
+    swapped = swap_latest(db, collection, json_data)
+    if swapped is None:
+        return False
+    version, previous = swapped
+
+    try:
+        db[collection].insert_one(dict(json_data))
+    except PyMongoError:
+        restore_latest(db, collection, version, previous)
+        raise
+    try:
+        update_rollup(
+            db, collection, [json_data],
+            timezone=current_app.config.get('BUCKET_TIMEZONE', 'UTC')
+        )
+    except PyMongoError as e:
+        # Repaired by flask vapi rollup-backfill
+        logger.warning('rollup update of %s failed: %s', collection, e)
+    put_latest(collection, version, json_data)
+    return True
@@ -0,0 +1,125 @@
+"""app/api/v2/gold/latest.py
+
+Latest price of every gold vendor, cached per worker together with the
+serialized body of the plain ``GET /api/v2/gold/<vendor>`` response. The POST
+handlers swap the new price into the vendor's ``vapi.snapshot`` document,
+which bumps its version so other workers reload it, and write it through
+to the cache of their own worker. Workers reload the price from that same
+document, so a version is never cached with an older price.
+"""
+from bson.decimal128 import Decimal128
+from flask import jsonify
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.api.v2.gold.get_query import get_query
+from app.db.cache import SNAPSHOT_COLLECTION, cache
+
+
+def get_public_row(doc):
+    """A stored gold price in the shape of get_projection()"""
+    row = {}
+    for k, v in doc.items():
+        if k == '_id':
+            continue
+        if k == 'datetime':
+            v = v.strftime("%s")
+        elif type(v) is Decimal128:
+            v = float(v.to_decimal())
+        row[k] = v
+    return row
+
+
+def serialize(results):
+    """Response body of a list of gold prices"""
+    return jsonify({
+        'results': results
+    }).get_data()
+
+
+def find_latest(db, collection):
+    """Latest gold price of a vendor, as a list of at most one row.
+
+    Read from the snapshot document, or from the history while the
+    snapshot holds no dated price yet.
+    """
+    snapshot = db[SNAPSHOT_COLLECTION].find_one(
+        {'_id': collection},
+        projection={'doc': True}
+    )
+    if snapshot is not None and 'datetime' in snapshot.get('doc', {}):
+        return [get_public_row(snapshot['doc'])]
+    return list(db[collection].aggregate(get_query(type=0)))
+
+
+def get_cached(db, collection):
+    """(rows, serialized body) of find_latest(), from the per-worker cache"""
+    def loader():
+        results = find_latest(db, collection)
+        return results, serialize(results)
+
+    return cache.get(db, collection, loader)
+
+
+def get_latest(db, collection):
+    """Serialized find_latest() response, served from the per-worker cache"""
+    return get_cached(db, collection)[1]
+
+
+def get_latest_results(db, collection):
+    """find_latest() rows, served from the per-worker cache"""
+    return get_cached(db, collection)[0]
+
+
+def swap_latest(db, collection, doc):
+    """Record doc as the latest price unless it equals the current one.
+
+    The snapshot document keeps a copy of the latest price in ``doc``; it is
+    replaced, and the version bumped, in one conditional upsert. When every
+    field but ``datetime`` is unchanged the filter does not match and the
+    upsert collides with the existing _id. Returns (new version, previous
+    price), or None if unchanged.
+    """
+    changed = [{'doc.' + k: {'$ne': v}} for k, v in doc.items() if k != 'datetime']
+    changed.append({'doc': {'$exists': False}})
+    try:
+        snapshot = db[SNAPSHOT_COLLECTION].find_one_and_update(
+            {
+                '_id': collection,
+                '$or': changed
+            }, {
+                '$set': {
+                    'doc': doc
+                },
+                '$inc': {
+                    'version': 1
+                }
+            },
+            projection={'version': True, 'doc': True},
+            upsert=True,
+            return_document=ReturnDocument.BEFORE
+        )
+    except DuplicateKeyError:
+        return None
+    if snapshot is None:
+        return 1, None
+    return snapshot.get('version', 0) + 1, snapshot.get('doc')
+
+
+def restore_latest(db, collection, version, previous):
+    """Undo swap_latest() unless another price was swapped in since"""
+    update = {'$inc': {'version': 1}}
+    if previous is None:
+        update['$unset'] = {'doc': True}
+    else:
+        update['$set'] = {'doc': previous}
+    db[SNAPSHOT_COLLECTION].update_one(
+        {'_id': collection, 'version': version},
+        update
+    )
+
+
+def put_latest(collection, version, doc):
+    """Write a newly inserted price through to the cache of this worker"""
+    results = [get_public_row(doc)]
+    cache.put(collection, version, (results, serialize(results)))
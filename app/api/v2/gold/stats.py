@@ -0,0 +1,116 @@
+"""app/api/v2/gold/stats.py"""
+import re
+
+from flask import jsonify, make_response, request
+
+from app.api.auth import require_api_key
+from app.api.v2.gold import bp
+from app.api.v2.gold.get_query import get_stats_query
+from app.api.v2.gold.latest import get_latest_results
+from app.api.v2.gold.vendors import VENDORS, vendor_collection
+from app.db.mongodb_connect import MongoDBConnect
+from app.errors import error_response
+from app.helper.DateHelper import get_date_range
+
+SCOPE = 'gold'
+FIELD_PATTERN = re.compile(r'^[a-z0-9_]+$')
+
+
+@bp.route('/api/v2/gold/<string:vendor>/stats', methods=['GET'])
+@require_api_key(scope=SCOPE, permission=0)
+def api_v2_gold_stats_get(vendor):
+    """.. :quickref: 00. Statistics; Get gold price statistics of a period
+
+    This function allows users to get the minimum, maximum, average, first and last
+    price of a vendor over a period, with the percent change and the sell - buy spread.
+
+    **Request**:
+
+    .. sourcecode:: http
+
+      GET /api/v2/gold/sjc/stats?from=2024-01-01&to=2024-12-31&fields=buy_1l,sell_1l HTTP/1.1
+      Host: https://api.vnappmob.com
+      Accept: application/json
+
+    **Response**:
+
+    .. sourcecode:: http
+
+      HTTP/1.1 200 OK
+      Vary: Accept
+      Content-Type: application/json
+
+      {
+          "results": {
+              "count": 1240,
+              "datetime_first": "1704067200",
+              "datetime_last": "1735603200",
+              "fields": {
+                  "buy_1l": {
+                      "min": 73500000.00,
+                      "max": 88500000.00,
+                      "avg": 79870000.00,
+                      "first": 73500000.00,
+                      "last": 82500000.00,
+                      "change_percent": 12.24
+                  },
+                  "sell_1l": {...}
+              },
+              "spreads": {
+                  "1l": {
+                      "min": 1500000.00,
+                      "max": 5000000.00,
+                      "avg": 2100000.00
+                  }
+              }
+          }
+      }
+
+    :reqheader Authorization: Bearer <api_key|scope=gold|permission=0>
+    :queryparam from: Optional first date in YYYY-MM-DD format, the 30 days ending with ``to`` by default
+    :queryparam to: Optional last date (included) in YYYY-MM-DD format, today by default
+    :queryparam fields: Optional comma separated price fields, every field of the latest price by default
+    :resheader Content-Type: application/json
+    :status 200: OK
+    :status 400: Error
+    :status 403: Fail on authorization
+    :status 404: Unknown vendor
+    """
+    try:
+        if vendor not in VENDORS:
+            return error_response(404, 'Unknown vendor: %s' % vendor)
+
+        try:
+            date_from, date_to = get_date_range(request.args, 30)
+        except ValueError:
+            return error_response(400, 'Invalid date format. Use YYYY-MM-DD format.')
+
+        db_connect = MongoDBConnect()
+        db = db_connect.connection['vapi']
+        collection = vendor_collection(vendor)
+
+        fields_param = request.args.get('fields')
+        if fields_param:
+            fields = [f.strip() for f in fields_param.split(',') if f.strip()]
+            if not all(FIELD_PATTERN.match(f) for f in fields):
+                return error_response(400, 'Invalid fields parameter.')
+        else:
+            fields = [
+                k for row in get_latest_results(db, collection)
+                for k, v in row.items() if isinstance(v, (int, float))
+            ]
+
+        results = list(db[collection].aggregate(
+            get_stats_query(fields, date_from, date_to)))
+
+        responses = {
+            'results': results[0] if results else {
+                'count': 0,
+                'fields': {},
+                'spreads': {}
+            }
+        }
+
+        return make_response((jsonify(responses)), 200)
+    except Exception as e:
+        return error_response(400, str(e))
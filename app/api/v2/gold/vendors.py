@@ -0,0 +1,17 @@
+"""app/api/v2/gold/vendors.py"""
+
+# Gold vendors, by the gold_<vendor> suffix of their history collection
+VENDORS = ('sjc', 'doji', 'pnj')
+
+# Price fields posted by every vendor, as documented by its POST handler
+VENDOR_FIELDS = {
+    'sjc': ['buy_1l', 'sell_1l', 'buy_1c', 'sell_1c', 'buy_nhan1c', 'sell_nhan1c',
+            'buy_trangsuc49', 'sell_trangsuc49'],
+    'doji': ['buy_hcm', 'sell_hcm', 'buy_hn', 'sell_hn'],
+    'pnj': ['buy_hcm', 'sell_hcm', 'buy_hn', 'sell_hn']
+}
+
+
+def vendor_collection(vendor):
+    """History collection of a vendor"""
+    return 'gold_' + vendor
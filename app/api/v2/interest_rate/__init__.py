@@ -114,5 +114,3 @@ def api_v2_interest_rate_get(bankcode):
         return make_response((jsonify(responses)), 200)
     except Exception as e:
         return error_response(400, str(e))
-    finally:
-        db_connect.connection.close()
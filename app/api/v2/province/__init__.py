@@ -68,8 +68,6 @@ def api_province_get():
         return make_response((jsonify(responses)), 200)
     except Exception as e:
         return error_response(400, str(e))
-    finally:
-        db_connect.connection.close()
 
 
 @bp.route('/api/v2/province/district/<string:province_id>', methods=['GET'])
@@ -133,8 +131,6 @@ def api_district_get(province_id):
         return make_response((jsonify(responses)), 200)
     except Exception as e:
         return error_response(400, str(e))
-    finally:
-        db_connect.connection.close()
     
 
 
@@ -199,6 +195,4 @@ def api_ward_get(district_id):
         return make_response((jsonify(responses)), 200)
     except Exception as e:
         return error_response(400, str(e))
-    finally:
-        db_connect.connection.close()
     
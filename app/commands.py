@@ -0,0 +1,117 @@
+"""app/commands.py"""
+import datetime
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from app.api.auth import generate_api_key
+from app.db.indexes import ensure_indexes, tick_collections
+from app.db.mongodb_connect import get_client
+from app.db.plan_audit import audit_plans as run_audit
+from app.db.rollup import backfill_rollup, bucket_day
+from app.db.synthetic import generate_history as run_generate_history
+
+cli = AppGroup('vapi', help='vAPI maintenance commands')  # pylint: disable=C
+
+
+@cli.command('create-indexes')
+def create_indexes():
+    """Create the MongoDB indexes used by the v2 endpoints"""
+    for row in ensure_indexes(get_client()):
+        click.echo('%s %s %s' % (
+            row['namespace'],
+            row['index'],
+            'created' if row['created'] else 'exists'
+        ))
+        for endpoint in row['covers']:
+            click.echo('    covers %s' % endpoint)
+
+
+@cli.command('issue-api-key')
+@click.option('--scope', default='*', show_default=True)
+@click.option('--permission', default=0, show_default=True, help='0:r | 1:rw | 2:rwd')
+@click.option('--dtl', default=365, show_default=True, help='Days to live')
+@click.option('--tier', default=None, help='Rate limit tier of RATELIMIT_TIERS')
+@click.option('--admin', is_flag=True, help='Allow the /api/v2/admin endpoints')
+def issue_api_key(scope, permission, dtl, tier, admin):
+    """Issue an api_key with claims /api/request_api_key never sets"""
+    if tier is not None and tier not in current_app.config.get('RATELIMIT_TIERS', {}):
+        raise click.ClickException('Unknown tier: %s' % tier)
+    click.echo(generate_api_key(
+        scope=scope, permission=permission, dtl=dtl, tier=tier, admin=admin))
+
+
+@cli.command('rollup-backfill')
+@click.option('--collection', multiple=True,
+              help='Tick collection to rebuild, every exchange_rate_* and gold_* by default')
+@click.option('--since', default=None,
+              help='Only rebuild days from this YYYY-MM-DD date on')
+def rollup_backfill(collection, since):
+    """Rebuild the daily OHLC rollups from the raw ticks"""
+    db = get_client()['vapi']
+    timezone = current_app.config.get('BUCKET_TIMEZONE', 'UTC')
+    if since:
+        since = bucket_day(datetime.datetime.strptime(since, '%Y-%m-%d'), timezone)
+
+    collections = collection or \
+        tick_collections(db, 'exchange_rate_') + tick_collections(db, 'gold_')
+    for name in collections:
+        backfill_rollup(
+            db, name,
+            timezone=timezone,
+            by_currency=name.startswith('exchange_rate_'),
+            since=since
+        )
+        click.echo('%s rebuilt' % name)
+
+
+@cli.command('audit-plans')
+@click.option('--max-sort-docs', default=1000, show_default=True,
+              help='Largest number of documents a plan may sort in memory')
+def audit_plans(max_sort_docs):
+    """Explain every v2 query and fail on COLLSCAN or large in-memory sorts"""
+    failed = 0
+    for case, problems in run_audit(get_client(), max_sort_docs):
+        click.echo('%s %s.%s %s' % (
+            'FAIL' if problems else 'ok',
+            case['db'],
+            case['collection'],
+            case['name']
+        ))
+        for problem in problems:
+            click.echo('    %s' % problem)
+        failed += 1 if problems else 0
+    if failed:
+        raise click.ClickException('%s query plans failed the audit' % failed)
+
+
+@cli.command('generate-history')
+@click.option('--years', default=1.0, show_default=True, help='Years of history until now')
+@click.option('--interval-seconds', default=60, show_default=True,
+              help='Seconds between two ticks')
+@click.option('--change-probability', default=0.1, show_default=True,
+              help='Probability that a price changes at a tick')
+@click.option('--bank', multiple=True, help='Bank to generate, every bank by default')
+@click.option('--vendor', multiple=True, help='Gold vendor to generate, every vendor by default')
+@click.option('--batch-size', default=10000, show_default=True)
+@click.option('--seed', default=0, show_default=True, help='Random seed')
+@click.option('--drop', is_flag=True, help='Drop the generated collections first')
+def generate_history(years, interval_seconds, change_probability, bank, vendor,
+                     batch_size, seed, drop):
+    """Bulk-load synthetic exchange rate and gold history"""
+    date_to = datetime.datetime.now().replace(microsecond=0)
+    date_from = date_to - datetime.timedelta(days=365 * years)
+    report = run_generate_history(
+        get_client()['vapi'], date_from, date_to,
+        interval_seconds=interval_seconds,
+        change_probability=change_probability,
+        banks=bank or None,
+        vendors=vendor or None,
+        batch_size=batch_size,
+        seed=seed,
+        timezone=current_app.config.get('BUCKET_TIMEZONE', 'UTC'),
+        drop=drop
+    )
+    for collection, count in report:
+        click.echo('%s %s documents' % (collection, count))
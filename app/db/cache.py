@@ -0,0 +1,127 @@
+"""app/db/cache.py
+
+Per-worker cache of hot query results. Every cached key has a version stamp
+in ``vapi.snapshot`` (``{'_id': key, 'version': n}``) which writers bump
+after changing the underlying data; readers check the stamp at most once
+per ``CACHE_VERSION_CHECK_MS`` and reload the value when it moved.
+
+The same document carries the content hash of the last ingested payload
+(``hash``) so writers can drop an unchanged push after one point read. The
+hash is removed whenever the data stops matching one whole payload.
+"""
+import hashlib
+import json
+import time
+
+from flask import current_app
+from pymongo import ReturnDocument
+
+SNAPSHOT_COLLECTION = 'snapshot'
+
+
+class VersionedCache:
+    """VersionedCache"""
+
+    def __init__(self):
+        super().__init__()
+        self._entries = {}
+        self._versions = {}
+
+    def get(self, db, key, loader):
+        """Return the cached value of key, calling loader when it is stale"""
+        check_interval = current_app.config.get('CACHE_VERSION_CHECK_MS', 1000) / 1000
+        now = time.monotonic()
+        version, checked_at = self._versions.get(key, (None, None))
+        if checked_at is None or now - checked_at >= check_interval:
+            version = current_version(db, key)
+            self._versions[key] = (version, now)
+
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+
+        # The stamp is read before the data, so a concurrent write can only
+        # make the stored value newer than its version, never older.
+        value = loader()
+        self._entries[key] = (version, value)
+        return value
+
+    def put(self, key, version, value):
+        """Store a value this worker has just written under version"""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is not None and entry[0] > version:
+            return
+        self._entries[key] = (version, value)
+        self.set_version(key, version)
+
+    def set_version(self, key, version):
+        """Record a version this worker has just written"""
+        self._versions[key] = (version, time.monotonic())
+
+    def clear(self):
+        """Drop every cached value"""
+        self._entries.clear()
+        self._versions.clear()
+
+
+def current_version(db, key):
+    """Current version stamp of key, 0 if it was never bumped"""
+    snapshot = db[SNAPSHOT_COLLECTION].find_one(
+        {'_id': key},
+        projection={'version': True}
+    )
+    return snapshot['version'] if snapshot else 0
+
+
+def bump_version(db, key, content_hash=None):
+    """Invalidate key in every worker, recording the hash of the new data.
+
+    Without content_hash the stored hash is removed, as the data no longer
+    matches it.
+    """
+    update = {'$inc': {'version': 1}}
+    if content_hash is not None:
+        update['$set'] = {'hash': content_hash}
+    else:
+        update['$unset'] = {'hash': ''}
+    snapshot = db[SNAPSHOT_COLLECTION].find_one_and_update(
+        {'_id': key},
+        update,
+        projection={'version': True},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    cache.set_version(key, snapshot['version'])
+    return snapshot['version']
+
+
+def get_content_hash(data):
+    """Canonical hash of a JSON-like payload"""
+    canonical = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+
+def current_hash(db, key):
+    """Content hash of the last payload ingested under key"""
+    snapshot = db[SNAPSHOT_COLLECTION].find_one(
+        {'_id': key},
+        projection={'hash': True}
+    )
+    return snapshot.get('hash') if snapshot else None
+
+
+def store_hash(db, key, content_hash):
+    """Record the content hash of an ingested payload without a new version,
+    or remove it when content_hash is None"""
+    if content_hash is None:
+        update = {'$unset': {'hash': ''}}
+    else:
+        update = {'$set': {'hash': content_hash}}
+    db[SNAPSHOT_COLLECTION].update_one(
+        {'_id': key},
+        update,
+        upsert=True
+    )
+
+
+cache = VersionedCache()  # pylint: disable=C
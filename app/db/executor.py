@@ -0,0 +1,57 @@
+"""app/db/executor.py
+
+Process-wide thread pool used to issue independent MongoDB queries of one
+request concurrently.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from app import timing
+
+_lock = threading.Lock()
+_local = threading.local()
+_executor = None
+_executor_pid = None
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _lock:
+            if _executor is None or _executor_pid != pid:
+                _executor = ThreadPoolExecutor(
+                    max_workers=current_app.config.get('MONGODB_FAN_OUT_WORKERS', 8),
+                    thread_name_prefix='vapi-fan-out'
+                )
+                _executor_pid = pid
+    return _executor
+
+
+def fan_out(func, items):
+    """Call func on every item concurrently and return results in order.
+
+    Calls made from inside a fan-out run inline, so nested fan-outs cannot
+    starve the pool.
+    """
+    items = list(items)
+    if len(items) <= 1 or getattr(_local, 'active', False):
+        return [func(item) for item in items]
+
+    app = current_app._get_current_object()  # pylint: disable=W
+    recorder = timing.current()
+
+    def run(item):
+        _local.active = True
+        timing.use(recorder)
+        try:
+            with app.app_context():
+                return func(item)
+        finally:
+            _local.active = False
+            timing.use(None)
+
+    return list(_get_executor().map(run, items))
@@ -0,0 +1,117 @@
+"""app/db/indexes.py
+
+Indexes the v2 endpoints rely on. ``ensure_indexes`` is idempotent and is
+run by ``flask vapi create-indexes`` or at startup when
+``MONGODB_CREATE_INDEXES`` is set.
+"""
+import pymongo
+
+DERIVED_SUFFIXES = ('_latest', '_daily')
+
+INDEXES = [
+    {
+        'db': 'vapi',
+        'prefix': 'exchange_rate_',
+        'keys': [('currency', pymongo.ASCENDING), ('datetime', pymongo.DESCENDING)],
+        'covers': [
+            'GET /api/v2/exchange_rate/<bank>?date=',
+            'GET /api/v2/exchange_rate/<bank>?currency=&date=',
+        ]
+    }, {
+        'db': 'vapi',
+        'prefix': 'exchange_rate_',
+        'keys': [('datetime', pymongo.DESCENDING)],
+        'covers': [
+            'rebuild of exchange_rate_<bank>_latest',
+        ]
+    }, {
+        'db': 'vapi',
+        'prefix': 'gold_',
+        'keys': [('datetime', pymongo.DESCENDING)],
+        'covers': [
+            'GET /api/v2/gold/<vendor>',
+            'GET /api/v2/gold/<vendor>?date_from=&date_to=&interval=',
+            'GET /api/v2/gold/<vendor>/stats?from=&to=',
+        ]
+    }, {
+        'db': 'vapi',
+        'prefix': 'exchange_rate_',
+        'suffix': '_daily',
+        'keys': [('currency', pymongo.ASCENDING), ('date', pymongo.ASCENDING)],
+        'covers': [
+            'GET /api/v2/exchange_rate/<bank>/history?interval=day|week|month',
+        ]
+    }, {
+        'db': 'vapi',
+        'prefix': 'gold_',
+        'suffix': '_daily',
+        'keys': [('date', pymongo.ASCENDING)],
+        'covers': [
+            'GET /api/v2/gold/<vendor>?date_from=&date_to=&interval=',
+        ]
+    }, {
+        'db': 'vapi',
+        'collection': 'api_usage',
+        'keys': [('hour', pymongo.ASCENDING)],
+        'covers': [
+            'GET /api/v2/admin/usage',
+        ]
+    }, {
+        'db': 'province_db',
+        'collection': 'province',
+        'keys': [('province_type', pymongo.ASCENDING)],
+        'covers': [
+            'GET /api/v2/province/',
+        ]
+    }, {
+        'db': 'province_db',
+        'collection': 'district',
+        'keys': [('province_id', pymongo.ASCENDING), ('district_id', pymongo.ASCENDING)],
+        'covers': [
+            'GET /api/v2/province/district/<province_id>',
+        ]
+    }, {
+        'db': 'province_db',
+        'collection': 'ward',
+        'keys': [('district_id', pymongo.ASCENDING), ('ward_id', pymongo.ASCENDING)],
+        'covers': [
+            'GET /api/v2/province/ward/<district_id>',
+        ]
+    }
+]
+
+
+def tick_collections(db, prefix):
+    """Raw tick collections of a prefix, without their derived collections"""
+    return sorted(
+        name for name in db.list_collection_names()
+        if name.startswith(prefix) and not name.endswith(DERIVED_SUFFIXES)
+    )
+
+
+def _collections(client, spec):
+    if 'collection' in spec:
+        return [spec['collection']]
+    if 'suffix' in spec:
+        return sorted(
+            name for name in client[spec['db']].list_collection_names()
+            if name.startswith(spec['prefix']) and name.endswith(spec['suffix'])
+        )
+    return tick_collections(client[spec['db']], spec['prefix'])
+
+
+def ensure_indexes(client):
+    """Create every index in INDEXES, returning one report row per index"""
+    report = []
+    for spec in INDEXES:
+        for name in _collections(client, spec):
+            collection = client[spec['db']][name]
+            existing = collection.index_information()
+            index_name = collection.create_index(spec['keys'])
+            report.append({
+                'namespace': '%s.%s' % (spec['db'], name),
+                'index': index_name,
+                'created': index_name not in existing,
+                'covers': spec['covers']
+            })
+    return report
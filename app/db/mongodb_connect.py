@@ -1,17 +1,79 @@
+"""app/db/mongodb_connect.py"""
+import os
+import threading
+
 import pymongo
 from flask import current_app
 
+from app.db.monitoring import command_monitor
+from app.timing import span
+
+_lock = threading.Lock()
+_client = None
+_client_pid = None
+_client_created = 0
+
+
+def _reset_after_fork():
+    """Drop the parent's client so the child builds its own pool"""
+    global _lock, _client, _client_pid
+    _lock = threading.Lock()
+    _client = None
+    _client_pid = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _build_client(config):
+    mongodb_config = config['MONGODB_CONFIG']
+    credentials = ''
+    if mongodb_config['db_user']:
+        # A local mongod (e.g. the benchmark one) runs without authentication
+        credentials = '%s:%s@' % (
+            mongodb_config['db_user'],
+            mongodb_config['db_password']
+        )
+    return pymongo.MongoClient(
+        'mongodb://%s%s:%s' % (
+            credentials,
+            mongodb_config['db_host'],
+            mongodb_config['db_port']
+        ),
+        connect=False,
+        event_listeners=[command_monitor],
+        **config.get('MONGODB_POOL_CONFIG', {})
+    )
+
+
+def get_client():
+    """Return the process-wide MongoClient.
+
+    The client is created lazily on first use in each process, so gunicorn
+    workers never inherit sockets from the master, and is then shared by
+    every request and thread of that worker.
+    """
+    global _client, _client_pid, _client_created
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _lock:
+            if _client is None or _client_pid != pid:
+                _client = _build_client(current_app.config)
+                _client_pid = pid
+                _client_created += 1
+    return _client
+
+
+def client_created_count():
+    """Number of MongoClient instances created by this process"""
+    return _client_created
+
 
 class MongoDBConnect:
     """MongoDBConnect"""
 
     def __init__(self):
         super().__init__()
-        self.connection = pymongo.MongoClient(
-            'mongodb://%s:%s@%s:%s' % (
-                current_app.config['MONGODB_CONFIG']['db_user'],
-                current_app.config['MONGODB_CONFIG']['db_password'],
-                current_app.config['MONGODB_CONFIG']['db_host'],
-                current_app.config['MONGODB_CONFIG']['db_port']
-            )
-        )
+        with span('connect'):
+            self.connection = get_client()
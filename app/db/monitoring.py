@@ -0,0 +1,94 @@
+"""app/db/monitoring.py
+
+Command monitoring of the shared MongoClient. Every command adds its
+duration to the 'db' span of the request that issued it; data commands are
+also counted per collection in the metrics, and the ones slower than
+``SLOW_QUERY_MS`` are logged with the Flask endpoint that issued them.
+"""
+import logging
+import threading
+
+from pymongo import monitoring
+
+from app import timing
+from app.metrics import observe_command
+
+logger = logging.getLogger(__name__)  # pylint: disable=C
+
+# Commands counted per collection, with the field holding the collection name
+DATA_COMMANDS = {
+    'aggregate': 'aggregate',
+    'find': 'find',
+    'getMore': 'collection',
+    'insert': 'insert',
+    'update': 'update',
+    'delete': 'delete',
+    'findAndModify': 'findAndModify',
+    'count': 'count',
+    'distinct': 'distinct'
+}
+
+# Part of a command shown in the slow query log
+LOGGED_FIELDS = ('pipeline', 'filter', 'sort', 'query', 'updates', 'limit')
+
+
+def get_documents(reply):
+    """Number of documents returned or written by a command"""
+    cursor = reply.get('cursor')
+    if cursor is not None:
+        return len(cursor.get('firstBatch', cursor.get('nextBatch', [])))
+    return reply.get('n', 0)
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """CommandMonitor"""
+
+    def __init__(self):
+        super().__init__()
+        self.slow_seconds = 0.1
+        self._started = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        field = DATA_COMMANDS.get(event.command_name)
+        if field is None:
+            return
+        recorder = timing.current()
+        command = event.command
+        with self._lock:
+            self._started[(event.connection_id, event.request_id)] = (
+                '%s.%s' % (event.database_name, command.get(field)),
+                recorder.endpoint if recorder is not None else None,
+                {k: command[k] for k in LOGGED_FIELDS if k in command}
+            )
+
+    def succeeded(self, event):
+        self._finished(event, event.reply)
+
+    def failed(self, event):
+        self._finished(event, {}, failure=event.failure)
+
+    def _finished(self, event, reply, failure=None):
+        seconds = event.duration_micros / 1000000
+        recorder = timing.current()
+        if recorder is not None:
+            recorder.add('db', seconds)
+
+        with self._lock:
+            started = self._started.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        namespace, endpoint, command = started
+        documents = get_documents(reply)
+        observe_command(event.command_name, namespace, seconds, documents)
+
+        if seconds >= self.slow_seconds:
+            logger.warning(
+                'slow %s on %s: %.1f ms, %s documents, endpoint %s, %s%s',
+                event.command_name, namespace, seconds * 1000, documents,
+                endpoint, str(command)[:1000],
+                ' (failed: %s)' % failure if failure else ''
+            )
+
+
+command_monitor = CommandMonitor()  # pylint: disable=C
@@ -0,0 +1,176 @@
+"""app/db/plan_audit.py
+
+Runs ``explain("executionStats")`` on the pipelines and finds the v2
+endpoints issue and flags plans that scan a whole collection or sort more
+than a document budget in memory. Used by ``flask vapi audit-plans``.
+"""
+import datetime
+
+from bson.son import SON
+
+from app.api.v2.admin.usage import get_usage_query
+from app.api.usage import USAGE_COLLECTION
+from app.api.v2.exchange_rate.as_of import find_currencies, get_as_of_query
+from app.api.v2.exchange_rate.banks import BANKS, bank_collection
+from app.api.v2.exchange_rate.get_query import get_history_query
+from app.api.v2.exchange_rate.get_query import get_query as get_exchange_rate_query
+from app.api.v2.exchange_rate.latest import get_latest_query, latest_collection
+from app.api.v2.gold.get_query import get_query as get_gold_query
+from app.api.v2.gold.get_query import get_stats_query
+from app.api.v2.gold.vendors import VENDORS, vendor_collection
+from app.db.rollup import daily_collection, is_numeric
+
+
+def aggregate_case(name, db, collection, pipeline):
+    """An aggregation to audit"""
+    return {
+        'name': name,
+        'db': db,
+        'collection': collection,
+        'command': SON([
+            ('aggregate', collection),
+            ('pipeline', pipeline),
+            ('cursor', {})
+        ])
+    }
+
+
+def find_case(name, db, collection, filter, sort):  # pylint: disable=W
+    """A find to audit"""
+    return {
+        'name': name,
+        'db': db,
+        'collection': collection,
+        'command': SON([
+            ('find', collection),
+            ('filter', filter),
+            ('sort', SON(sort))
+        ])
+    }
+
+
+def get_cases(client, history_limit=1000):
+    """Every query shape of the v2 endpoints, with parameters from the data"""
+    db = client['vapi']
+    date_to = datetime.datetime.now()
+    date_from = date_to - datetime.timedelta(days=30)
+    cases = []
+
+    for bank, fields in BANKS.items():
+        collection = bank_collection(bank)
+        currency = (find_currencies(db, collection) or ['USD'])[0]
+        cases.extend([
+            aggregate_case(
+                'GET /api/v2/exchange_rate/%s' % bank, 'vapi',
+                latest_collection(collection), get_latest_query(fields)),
+            aggregate_case(
+                'GET /api/v2/exchange_rate/%s?currency=' % bank, 'vapi',
+                latest_collection(collection), get_latest_query(fields, currency)),
+            aggregate_case(
+                'GET /api/v2/exchange_rate/%s?date=' % bank, 'vapi',
+                collection, get_as_of_query(fields, currency, date_to)),
+            aggregate_case(
+                'rebuild of %s' % latest_collection(collection), 'vapi',
+                collection, get_exchange_rate_query(fields)),
+            aggregate_case(
+                'latest %s row of %s' % (currency, collection), 'vapi',
+                collection, get_exchange_rate_query(fields, {'currency': currency})),
+            aggregate_case(
+                'GET /api/v2/exchange_rate/%s/history?interval=hour' % bank, 'vapi',
+                collection, get_history_query(
+                    fields, currency, date_from, date_to, 'hour', history_limit)),
+            aggregate_case(
+                'GET /api/v2/exchange_rate/%s/history?interval=day' % bank, 'vapi',
+                daily_collection(collection), get_history_query(
+                    fields, currency, date_from, date_to, 'day', history_limit,
+                    daily=True, collection=collection)),
+        ])
+
+    for vendor in VENDORS:
+        collection = vendor_collection(vendor)
+        last_row = db[collection].find_one(sort=[('datetime', -1)]) or {}
+        fields = [k for k, v in last_row.items() if k != '_id' and is_numeric(v)]
+        cases.extend([
+            aggregate_case(
+                'GET /api/v2/gold/%s' % vendor, 'vapi',
+                collection, get_gold_query(type=0)),
+            aggregate_case(
+                'GET /api/v2/gold/%s?date_from=&date_to=&interval=hour' % vendor, 'vapi',
+                collection, get_gold_query(
+                    type=1, date_from=date_from, date_to=date_to, interval='hour')),
+            aggregate_case(
+                'GET /api/v2/gold/%s?date_from=&date_to=' % vendor, 'vapi',
+                daily_collection(collection), get_gold_query(
+                    type=2, collection=collection, date_from=date_from, date_to=date_to)),
+            aggregate_case(
+                'GET /api/v2/gold/%s/stats' % vendor, 'vapi',
+                collection, get_stats_query(fields, date_from, date_to)),
+        ])
+
+    province = client['province_db']
+    province_id = (province['district'].find_one() or {}).get('province_id', '01')
+    district_id = (province['ward'].find_one() or {}).get('district_id', '001')
+    cases.extend([
+        find_case(
+            'GET /api/v2/province/', 'province_db', 'province',
+            {}, [('province_type', 1)]),
+        find_case(
+            'GET /api/v2/province/district/<province_id>', 'province_db', 'district',
+            {'province_id': province_id}, [('district_id', 1)]),
+        find_case(
+            'GET /api/v2/province/ward/<district_id>', 'province_db', 'ward',
+            {'district_id': district_id}, [('ward_id', 1)]),
+        aggregate_case(
+            'GET /api/v2/admin/usage', 'vapi',
+            USAGE_COLLECTION, get_usage_query(date_to - datetime.timedelta(days=1), date_to)),
+    ])
+    return cases
+
+
+def _plan_stages(node, stages):
+    if isinstance(node, dict):
+        if 'stage' in node:
+            stages.append(node['stage'])
+        for value in node.values():
+            _plan_stages(value, stages)
+    elif isinstance(node, list):
+        for value in node:
+            _plan_stages(value, stages)
+    return stages
+
+
+def get_problems(explain, max_sort_docs):
+    """COLLSCANs and in-memory sorts over max_sort_docs in an explain output"""
+    problems = []
+
+    def walk(node):
+        if isinstance(node, list):
+            for value in node:
+                walk(value)
+            return
+        if not isinstance(node, dict):
+            return
+        if 'queryPlanner' in node:
+            stages = _plan_stages(node['queryPlanner'].get('winningPlan', {}), [])
+            examined = node.get('executionStats', {}).get('totalDocsExamined', 0)
+            if 'COLLSCAN' in stages:
+                problems.append('COLLSCAN, %s documents examined' % examined)
+            if 'SORT' in stages and examined > max_sort_docs:
+                problems.append('in-memory SORT over %s documents' % examined)
+        if '$sort' in node and node.get('nReturned', 0) > max_sort_docs:
+            problems.append('in-memory $sort of %s documents' % node['nReturned'])
+        for value in node.values():
+            walk(value)
+
+    walk(explain)
+    return problems
+
+
+def audit_plans(client, max_sort_docs=1000):
+    """Explain every case, returning (case, problems) pairs"""
+    report = []
+    for case in get_cases(client):
+        explain = client[case['db']].command(
+            'explain', case['command'], verbosity='executionStats')
+        report.append((case, get_problems(explain, max_sort_docs)))
+    return report
@@ -0,0 +1,269 @@
+"""app/db/rollup.py
+
+Daily open/high/low/close documents of the ``exchange_rate_<bank>`` and
+``gold_<vendor>`` tick collections, stored in ``<collection>_daily``.
+
+Exchange rate rollups are keyed by ``{'currency': ..., 'date': ...}`` and
+gold rollups by ``date``, the start of the day in ``BUCKET_TIMEZONE``. Every
+numeric field becomes ``{'open', 'high', 'low', 'close'}``; ``first`` and
+``last`` are the datetimes of the first and last tick of the day. POST
+handlers update today's documents as ticks arrive and ``flask vapi
+rollup-backfill`` rebuilds them from the raw ticks.
+
+POST handlers only start a rollup from the day they are deployed, so reads
+use it once a full backfill has recorded ``backfilled_through`` in the
+``vapi.snapshot`` document of the rollup collection, and the raw ticks
+until then.
+"""
+import datetime
+
+from bson.decimal128 import Decimal128
+from dateutil import tz
+from pymongo import UpdateOne
+
+from app.db.cache import SNAPSHOT_COLLECTION
+
+NUMERIC_TYPES = ['double', 'int', 'long', 'decimal']
+
+# Rollup collections known to be backfilled by this worker
+_backfilled = set()
+
+
+def daily_collection(collection):
+    """Name of the daily rollup collection of a tick collection"""
+    return collection + '_daily'
+
+
+def bucket_day(value, timezone='UTC'):
+    """Start of the day of a naive datetime, in the bucket timezone"""
+    if timezone == 'UTC':
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+    zone = tz.gettz(timezone)
+    local = value.replace(tzinfo=datetime.timezone.utc).astimezone(zone)
+    local = local.replace(hour=0, minute=0, second=0, microsecond=0)
+    return local.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def get_rollup_days(date_from, date_to, timezone='UTC'):
+    """First and end of the whole days of a range, in the bucket timezone.
+
+    Reads take these days from the rollup and the partial days at both ends
+    of the range from the raw ticks, so they match a read of the ticks.
+    """
+    day_from = bucket_day(date_from, timezone)
+    if day_from < date_from:
+        day_from = bucket_day(date_from + datetime.timedelta(days=1), timezone)
+    return day_from, bucket_day(date_to, timezone)
+
+
+def get_partial_days_match(date_from, date_to, day_from, day_to):
+    """Filter of the raw ticks of a range outside its whole days"""
+    return {
+        '$or': [
+            {
+                'datetime': {
+                    '$gte': date_from,
+                    '$lt': min(day_from, date_to)
+                }
+            }, {
+                'datetime': {
+                    '$gte': max(day_to, date_from),
+                    '$lt': date_to
+                }
+            }
+        ]
+    }
+
+
+def rollup_key(doc, timezone='UTC', by_currency=False):
+    """_id of the rollup document a tick belongs to"""
+    day = bucket_day(doc['datetime'], timezone)
+    if by_currency:
+        return {
+            'currency': doc['currency'],
+            'date': day
+        }
+    return day
+
+
+def is_numeric(value):
+    """Whether a tick value is rolled up"""
+    return type(value) in (int, float, Decimal128)
+
+
+def update_rollup(db, collection, docs, timezone='UTC', by_currency=False):
+    """Fold new ticks into their daily rollup documents"""
+    requests = []
+    for doc in docs:
+        key = rollup_key(doc, timezone, by_currency)
+        update = {
+            '$setOnInsert': {
+                'date': bucket_day(doc['datetime'], timezone),
+                'first': doc['datetime']
+            },
+            '$set': {
+                'last': doc['datetime']
+            },
+            '$min': {},
+            '$max': {}
+        }
+        if by_currency:
+            update['$setOnInsert']['currency'] = doc['currency']
+        for k, v in doc.items():
+            if k in ('_id', 'datetime') or not is_numeric(v):
+                continue
+            update['$setOnInsert'][k + '.open'] = v
+            update['$set'][k + '.close'] = v
+            update['$min'][k + '.low'] = v
+            update['$max'][k + '.high'] = v
+        if not update['$min']:
+            del update['$min'], update['$max']
+        requests.append(UpdateOne({'_id': key}, update, upsert=True))
+
+    if not requests:
+        return None
+    return db[daily_collection(collection)].bulk_write(requests, ordered=False)
+
+
+def get_backfill_query(collection, timezone='UTC', by_currency=False, since=None):
+    """Pipeline rebuilding the daily rollup of a tick collection"""
+    day = {
+        '$dateTrunc': {
+            'date': '$datetime',
+            'unit': 'day',
+            'timezone': timezone
+        }
+    }
+    field_id = {
+        'date': day,
+        'k': '$fields.k'
+    }
+    day_id = '$_id.date'
+    header = {
+        '_id': '$_id.date',
+        'date': '$_id.date',
+        'first': '$first',
+        'last': '$last'
+    }
+    if by_currency:
+        field_id = {
+            'currency': '$currency',
+            'date': day,
+            'k': '$fields.k'
+        }
+        day_id = {
+            'currency': '$_id.currency',
+            'date': '$_id.date'
+        }
+        header['_id'] = '$_id'
+        header['date'] = '$_id.date'
+        header['currency'] = '$_id.currency'
+
+    query = []
+    if since:
+        query.append({
+            '$match': {
+                'datetime': {
+                    '$gte': since
+                }
+            }
+        })
+    query.extend([
+        {
+            '$sort': {
+                'datetime': 1
+            }
+        }, {
+            '$project': {
+                '_id': False,
+                'datetime': True,
+                'currency': True,
+                'fields': {
+                    '$filter': {
+                        'input': {
+                            '$objectToArray': '$$ROOT'
+                        },
+                        'cond': {
+                            '$in': [{'$type': '$$this.v'}, NUMERIC_TYPES]
+                        }
+                    }
+                }
+            }
+        }, {
+            '$unwind': '$fields'
+        }, {
+            '$group': {
+                '_id': field_id,
+                'open': {'$first': '$fields.v'},
+                'high': {'$max': '$fields.v'},
+                'low': {'$min': '$fields.v'},
+                'close': {'$last': '$fields.v'},
+                'first': {'$min': '$datetime'},
+                'last': {'$max': '$datetime'}
+            }
+        }, {
+            '$group': {
+                '_id': day_id,
+                'fields': {
+                    '$push': {
+                        'k': '$_id.k',
+                        'v': {
+                            'open': '$open',
+                            'high': '$high',
+                            'low': '$low',
+                            'close': '$close'
+                        }
+                    }
+                },
+                'first': {'$min': '$first'},
+                'last': {'$max': '$last'}
+            }
+        }, {
+            '$replaceRoot': {
+                'newRoot': {
+                    '$mergeObjects': [
+                        {'$arrayToObject': '$fields'},
+                        header
+                    ]
+                }
+            }
+        }, {
+            '$merge': {
+                'into': daily_collection(collection),
+                'whenMatched': 'replace',
+                'whenNotMatched': 'insert'
+            }
+        }
+    ])
+    return query
+
+
+def backfill_rollup(db, collection, timezone='UTC', by_currency=False, since=None):
+    """Rebuild the daily rollup of a tick collection from its raw ticks.
+
+    A full rebuild (no since) marks the rollup as backfilled.
+    """
+    started = datetime.datetime.now()
+    list(db[collection].aggregate(
+        get_backfill_query(collection, timezone, by_currency, since)))
+    if since is None:
+        db[SNAPSHOT_COLLECTION].update_one(
+            {'_id': daily_collection(collection)},
+            {'$set': {'backfilled_through': started}},
+            upsert=True
+        )
+
+
+def is_backfilled(db, collection):
+    """Whether the daily rollup of a tick collection holds every day"""
+    name = daily_collection(collection)
+    if name in _backfilled:
+        return True
+    snapshot = db[SNAPSHOT_COLLECTION].find_one(
+        {'_id': name},
+        projection={'backfilled_through': True}
+    )
+    if snapshot is None or 'backfilled_through' not in snapshot:
+        return False
+    _backfilled.add(name)
+    return True
@@ -0,0 +1,149 @@
+"""app/db/synthetic.py
+
+Synthetic exchange rate and gold history, for benchmarks and capacity
+planning. Every series follows a random walk sampled every
+``interval_seconds``; at each tick a series changes with
+``change_probability`` and, like the POST handlers, only changed prices are
+stored. Documents have the layout the POST handlers write: float rates per
+currency for exchange rates, Decimal128 prices for gold.
+"""
+import datetime
+import random
+
+from bson.decimal128 import Decimal128
+
+from app.api.v2.exchange_rate.banks import BANKS, bank_collection
+from app.api.v2.exchange_rate.latest import latest_collection, rebuild_latest
+from app.api.v2.gold.latest import swap_latest
+from app.api.v2.gold.vendors import VENDOR_FIELDS, VENDORS, vendor_collection
+from app.db.cache import bump_version
+from app.db.rollup import backfill_rollup, daily_collection
+
+# Mid rate in VND of every generated currency
+CURRENCIES = {
+    'USD': 25000, 'EUR': 27000, 'JPY': 165, 'GBP': 31500, 'AUD': 16300,
+    'CAD': 18200, 'CHF': 28000, 'CNY': 3450, 'HKD': 3200, 'KRW': 18,
+    'SGD': 18500, 'THB': 700, 'NZD': 15000, 'SEK': 2300, 'DKK': 3600,
+    'NOK': 2300, 'INR': 300, 'MYR': 5300, 'RUB': 270, 'KWD': 81000
+}
+
+# Buy price in VND of one tael of gold, sell prices are 2% higher
+GOLD_PRICE = 70000000
+
+# Relative change of a price when it moves
+VOLATILITY = 0.001
+
+
+def tick_times(date_from, date_to, interval_seconds):
+    """Naive local datetimes from date_from (included) to date_to (excluded)"""
+    step = datetime.timedelta(seconds=interval_seconds)
+    tick = date_from
+    while tick < date_to:
+        yield tick
+        tick += step
+
+
+def get_rate(mid, field):
+    """Rate of a field around a mid rate, sell above and buy below it"""
+    if field.startswith('sell'):
+        return round(mid * 1.01, 2)
+    if field == 'buy_cash':
+        return round(mid * 0.985, 2)
+    return round(mid * 0.99, 2)
+
+
+def exchange_rate_docs(fields, date_from, date_to, interval_seconds,
+                       change_probability, rng):
+    """Changed rates of every currency, tick by tick"""
+    mids = dict(CURRENCIES)
+    first = True
+    for tick in tick_times(date_from, date_to, interval_seconds):
+        for currency, mid in mids.items():
+            if not first and rng.random() >= change_probability:
+                continue
+            mid = mids[currency] = mid * (1 + rng.gauss(0, VOLATILITY))
+            doc = {
+                'datetime': tick,
+                'currency': currency
+            }
+            for field in fields:
+                doc[field] = get_rate(mid, field)
+            yield doc
+        first = False
+
+
+def gold_docs(fields, date_from, date_to, interval_seconds, change_probability, rng):
+    """Changed gold prices of a vendor, tick by tick"""
+    price = float(GOLD_PRICE)
+    first = True
+    for tick in tick_times(date_from, date_to, interval_seconds):
+        if not first and rng.random() >= change_probability:
+            continue
+        first = False
+        price = price * (1 + rng.gauss(0, VOLATILITY))
+        buy = round(price, -4)
+        doc = {}
+        for field in fields:
+            value = buy if field.startswith('buy') else round(buy * 1.02, -4)
+            doc[field] = Decimal128(str(value))
+        doc['datetime'] = tick
+        yield doc
+
+
+def insert_batches(collection, docs, batch_size):
+    """insert_many docs in unordered batches, returning the number inserted"""
+    count = 0
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            collection.insert_many(batch, ordered=False)
+            count += len(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+        count += len(batch)
+    return count
+
+
+def generate_history(db, date_from, date_to, interval_seconds=60, change_probability=0.1,
+                     banks=None, vendors=None, batch_size=10000, seed=0,
+                     timezone='UTC', drop=False):
+    """Generate the history of banks and vendors, all of them by default.
+
+    The latest snapshots, daily rollups and snapshot versions are rebuilt
+    afterwards, so the endpoints serve the generated data right away.
+    Returns (collection, inserted documents) pairs.
+    """
+    rng = random.Random(seed)
+    report = []
+
+    for bank in banks or BANKS:
+        collection = bank_collection(bank)
+        if drop:
+            for name in (collection, latest_collection(collection), daily_collection(collection)):
+                db.drop_collection(name)
+        count = insert_batches(db[collection], exchange_rate_docs(
+            BANKS[bank], date_from, date_to, interval_seconds, change_probability, rng
+        ), batch_size)
+        rebuild_latest(db, collection, BANKS[bank])
+        backfill_rollup(db, collection, timezone=timezone, by_currency=True)
+        bump_version(db, collection)
+        report.append((collection, count))
+
+    for vendor in vendors or VENDORS:
+        collection = vendor_collection(vendor)
+        if drop:
+            for name in (collection, daily_collection(collection)):
+                db.drop_collection(name)
+        count = insert_batches(db[collection], gold_docs(
+            VENDOR_FIELDS[vendor], date_from, date_to, interval_seconds,
+            change_probability, rng
+        ), batch_size)
+        backfill_rollup(db, collection, timezone=timezone)
+        last_row = db[collection].find_one(sort=[('datetime', -1)], projection={'_id': False})
+        if last_row is not None:
+            swap_latest(db, collection, last_row)
+        report.append((collection, count))
+
+    return report
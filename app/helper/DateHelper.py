@@ -0,0 +1,50 @@
+"""app/helper/DateHelper.py"""
+import datetime
+import os
+import time
+
+from dateutil import tz
+
+
+def parse_date(date_param):
+    """Start of a YYYY-MM-DD date, raises ValueError on bad input"""
+    return datetime.datetime.strptime(date_param, '%Y-%m-%d')
+
+
+def get_date_range(args, days):
+    """(date_from, date_to) of the YYYY-MM-DD ``from`` and ``to`` query args.
+
+    ``to`` is included and defaults to today, which ends the range now.
+    ``from`` defaults to the start of the range of ``days`` days ending
+    with ``to``. Raises ValueError on bad input.
+    """
+    if args.get('to'):
+        last_day = parse_date(args['to'])
+        date_to = last_day + datetime.timedelta(days=1)
+    else:
+        date_to = datetime.datetime.now()
+        last_day = date_to.replace(hour=0, minute=0, second=0, microsecond=0)
+    if args.get('from'):
+        date_from = parse_date(args['from'])
+    else:
+        date_from = last_day - datetime.timedelta(days=days - 1)
+    return date_from, date_to
+
+
+def get_local_timezone():
+    """Timezone of the server for MongoDB date operators.
+
+    The IANA name from ``TZ`` or ``/etc/localtime``, so naive local
+    datetimes are converted with the offset in effect at each date, like
+    ``strftime("%s")``. Falls back to today's UTC offset (``+07:00``) when
+    the zone has no IANA name.
+    """
+    name = (os.environ.get('TZ') or '').lstrip(':')
+    if not name and os.path.islink('/etc/localtime'):
+        name = os.path.realpath('/etc/localtime')
+    if 'zoneinfo/' in name:
+        name = name.split('zoneinfo/', 1)[1]
+    if name and isinstance(tz.gettz(name), (tz.tzfile, tz.tzutc)):
+        return name
+    offset = time.localtime().tm_gmtoff // 60
+    return '%s%02d:%02d' % ('-' if offset < 0 else '+', abs(offset) // 60, abs(offset) % 60)
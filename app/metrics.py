@@ -0,0 +1,326 @@
+"""app/metrics.py
+
+In-process request metrics, exposed by ``/metrics`` in the Prometheus text
+format (or as JSON with estimated percentiles).
+
+Every gunicorn worker keeps its own counters and histograms and writes a
+snapshot to ``METRICS_DIR/<pid>.json`` every ``METRICS_WRITE_SECONDS`` from
+a background thread; ``/metrics`` sums the snapshots of the live workers,
+so whichever worker answers reports the whole server.
+"""
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+
+from flask import current_app
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+DOCUMENT_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+logger = logging.getLogger(__name__)  # pylint: disable=C
+
+
+class Counter:
+    """Counter"""
+
+    def __init__(self, name, help_text, labels):
+        super().__init__()
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, value=1):
+        """Add value to the counter of a label tuple"""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + value
+
+    def snapshot(self):
+        """[[labels, value]...] of this worker"""
+        with self._lock:
+            return [[list(k), v] for k, v in self._values.items()]
+
+
+class Histogram:
+    """Histogram"""
+
+    def __init__(self, name, help_text, labels, buckets):
+        super().__init__()
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        """Count one observation of a label tuple"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = {
+                    'buckets': [0] * (len(self.buckets) + 1),
+                    'sum': 0,
+                    'count': 0
+                }
+            entry['buckets'][index] += 1
+            entry['sum'] += value
+            entry['count'] += 1
+
+    def snapshot(self):
+        """[[labels, {buckets, sum, count}]...] of this worker"""
+        with self._lock:
+            return [
+                [list(k), {
+                    'buckets': list(v['buckets']),
+                    'sum': v['sum'],
+                    'count': v['count']
+                }] for k, v in self._values.items()
+            ]
+
+
+REQUESTS = Counter(
+    'vapi_requests_total', 'Requests per route and status', ('route', 'status'))
+REQUEST_SECONDS = Histogram(
+    'vapi_request_duration_seconds', 'Request latency per route', ('route',),
+    LATENCY_BUCKETS)
+RESPONSE_BYTES = Histogram(
+    'vapi_response_size_bytes', 'Response size per route', ('route',),
+    SIZE_BUCKETS)
+SPAN_SECONDS = Histogram(
+    'vapi_span_seconds', 'Time spent per route in auth, connect, db and serialize',
+    ('route', 'span'), LATENCY_BUCKETS)
+COMMAND_SECONDS = Histogram(
+    'vapi_mongo_command_duration_seconds', 'MongoDB command latency per collection',
+    ('command', 'collection'), LATENCY_BUCKETS)
+COMMAND_DOCUMENTS = Histogram(
+    'vapi_mongo_command_documents', 'Documents returned or written per MongoDB command',
+    ('command', 'collection'), DOCUMENT_BUCKETS)
+
+METRICS = [REQUESTS, REQUEST_SECONDS, RESPONSE_BYTES, SPAN_SECONDS,
+           COMMAND_SECONDS, COMMAND_DOCUMENTS]
+
+# Callables returning {metric name: value} of this worker, summed over workers
+COLLECTORS = []
+
+
+def observe_request(route, status, seconds, size):
+    """Record a finished request"""
+    REQUESTS.inc((route, str(status)))
+    REQUEST_SECONDS.observe((route,), seconds)
+    RESPONSE_BYTES.observe((route,), size)
+
+
+def observe_spans(route, spans):
+    """Record the span totals of a finished request"""
+    for name, (seconds, _) in spans.items():
+        SPAN_SECONDS.observe((route, name), seconds)
+
+
+def observe_command(command, collection, seconds, documents):
+    """Record a finished MongoDB command"""
+    COMMAND_SECONDS.observe((command, collection), seconds)
+    COMMAND_DOCUMENTS.observe((command, collection), documents)
+
+
+def snapshot():
+    """Metrics of this worker"""
+    values = {}
+    for collector in COLLECTORS:
+        values.update(collector())
+    return {
+        'metrics': {metric.name: metric.snapshot() for metric in METRICS},
+        'values': values
+    }
+
+
+def get_metrics_dir(app):
+    """Directory of the per-worker snapshot files"""
+    return app.config.get('METRICS_DIR')
+
+
+def write_snapshot(app):
+    """Write the snapshot of this worker to METRICS_DIR/<pid>.json"""
+    metrics_dir = get_metrics_dir(app)
+    os.makedirs(metrics_dir, exist_ok=True)
+    path = os.path.join(metrics_dir, '%s.json' % os.getpid())
+    with open(path + '.tmp', 'w') as f:
+        json.dump(snapshot(), f)
+    os.replace(path + '.tmp', path)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def read_snapshots(app):
+    """Snapshots of every live worker, this one read from memory"""
+    snapshots = [snapshot()]
+    metrics_dir = get_metrics_dir(app)
+    if not os.path.isdir(metrics_dir):
+        return snapshots
+    for name in os.listdir(metrics_dir):
+        if not name.endswith('.json') or not name[:-5].isdigit():
+            continue
+        pid = int(name[:-5])
+        if pid == os.getpid():
+            continue
+        path = os.path.join(metrics_dir, name)
+        try:
+            if not _pid_alive(pid):
+                os.remove(path)
+                continue
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def merge_snapshots(snapshots):
+    """Sum the snapshots of several workers"""
+    merged = {metric.name: {} for metric in METRICS}
+    values = {}
+    for data in snapshots:
+        for metric in METRICS:
+            target = merged[metric.name]
+            for labels, value in data['metrics'].get(metric.name, []):
+                labels = tuple(labels)
+                if isinstance(metric, Counter):
+                    target[labels] = target.get(labels, 0) + value
+                    continue
+                entry = target.setdefault(labels, {
+                    'buckets': [0] * (len(metric.buckets) + 1),
+                    'sum': 0,
+                    'count': 0
+                })
+                for i, n in enumerate(value['buckets']):
+                    entry['buckets'][i] += n
+                entry['sum'] += value['sum']
+                entry['count'] += value['count']
+        for k, v in data['values'].items():
+            values[k] = values.get(k, 0) + v
+    return merged, values
+
+
+def estimate_quantile(buckets, counts, q):
+    """Quantile of a histogram, interpolated inside its bucket"""
+    total = sum(counts)
+    if total == 0:
+        return None
+    rank = q * total
+    seen = 0
+    for i, n in enumerate(counts):
+        if seen + n >= rank and n > 0:
+            if i == len(buckets):
+                return buckets[-1]
+            lower = buckets[i - 1] if i > 0 else 0
+            return lower + (buckets[i] - lower) * (rank - seen) / n
+        seen += n
+    return buckets[-1]
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (extra or [])
+    return '{%s}' % ','.join(
+        '%s="%s"' % (k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+        for k, v in pairs
+    )
+
+
+def render_text(merged, values):
+    """Prometheus text exposition of merged metrics"""
+    lines = []
+    for metric in METRICS:
+        kind = 'counter' if isinstance(metric, Counter) else 'histogram'
+        lines.append('# HELP %s %s' % (metric.name, metric.help_text))
+        lines.append('# TYPE %s %s' % (metric.name, kind))
+        for labels, value in sorted(merged[metric.name].items()):
+            if kind == 'counter':
+                lines.append('%s%s %s' % (
+                    metric.name, _format_labels(metric.labels, labels), value))
+                continue
+            cumulative = 0
+            for bound, n in zip(list(metric.buckets) + ['+Inf'], value['buckets']):
+                cumulative += n
+                lines.append('%s_bucket%s %s' % (
+                    metric.name,
+                    _format_labels(metric.labels, labels, [('le', bound)]),
+                    cumulative
+                ))
+            lines.append('%s_sum%s %s' % (
+                metric.name, _format_labels(metric.labels, labels), value['sum']))
+            lines.append('%s_count%s %s' % (
+                metric.name, _format_labels(metric.labels, labels), value['count']))
+    for name, value in sorted(values.items()):
+        lines.append('%s %s' % (name, value))
+    return '\n'.join(lines) + '\n'
+
+
+def render_json(merged, values):
+    """Count, p50 and p99 of every histogram, plus the counters"""
+    results = {'values': values}
+    for metric in METRICS:
+        rows = {}
+        for labels, value in sorted(merged[metric.name].items()):
+            key = '|'.join(labels)
+            if isinstance(metric, Counter):
+                rows[key] = value
+                continue
+            rows[key] = {
+                'count': value['count'],
+                'avg': value['sum'] / value['count'] if value['count'] else None,
+                'p50': estimate_quantile(metric.buckets, value['buckets'], 0.5),
+                'p99': estimate_quantile(metric.buckets, value['buckets'], 0.99)
+            }
+        results[metric.name] = rows
+    return results
+
+
+class SnapshotWriter:
+    """Background thread writing the snapshot of this worker"""
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._thread_pid = None
+
+    def ensure_started(self):
+        """Start the thread once per process"""
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+        app = current_app._get_current_object()  # pylint: disable=W
+        threading.Thread(
+            target=self._run,
+            args=(app,),
+            name='vapi-metrics-write',
+            daemon=True
+        ).start()
+
+    def _run(self, app):
+        interval = app.config.get('METRICS_WRITE_SECONDS', 5)
+        while True:
+            time.sleep(interval)
+            try:
+                write_snapshot(app)
+            except OSError as e:
+                logger.warning('metrics write failed: %s', e)
+
+
+snapshot_writer = SnapshotWriter()  # pylint: disable=C
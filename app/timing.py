@@ -0,0 +1,91 @@
+"""app/timing.py
+
+Per-request spans (auth, connect, db, serialize) used for the
+``Server-Timing`` response header and the ``vapi_span_seconds`` metric.
+
+The recorder of a request lives in a thread local: ``fan_out`` hands it to
+its pool threads, and the MongoDB command monitor (``app.db.monitoring``)
+adds the duration of every command to the recorder of the thread that ran it.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from flask.json.provider import DefaultJSONProvider
+
+_local = threading.local()
+
+
+class SpanRecorder:
+    """Total duration and count of every span of one request"""
+
+    def __init__(self, endpoint=None):
+        super().__init__()
+        self.endpoint = endpoint
+        self.spans = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        """Add one occurrence of a span"""
+        with self._lock:
+            total, count = self.spans.get(name, (0, 0))
+            self.spans[name] = (total + seconds, count + 1)
+
+
+def start(endpoint=None):
+    """Start recording the spans of the current request"""
+    _local.recorder = SpanRecorder(endpoint)
+    return _local.recorder
+
+
+def current():
+    """Recorder of the current thread, None outside of a request"""
+    return getattr(_local, 'recorder', None)
+
+
+def use(recorder):
+    """Record the spans of this thread into another thread's recorder"""
+    _local.recorder = recorder
+
+
+def stop():
+    """Stop recording and return the recorder of the current thread"""
+    recorder = current()
+    _local.recorder = None
+    return recorder
+
+
+@contextmanager
+def span(name):
+    """Time a block as one occurrence of a span"""
+    recorder = current()
+    if recorder is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.add(name, time.perf_counter() - started)
+
+
+def server_timing_header(recorder, total=None):
+    """Server-Timing header value of a recorder, durations in milliseconds"""
+    parts = []
+    for name, (seconds, count) in sorted(recorder.spans.items()):
+        part = '%s;dur=%.3f' % (name, seconds * 1000)
+        if count > 1:
+            part += ';desc="%s"' % count
+        parts.append(part)
+    if total is not None:
+        parts.append('total;dur=%.3f' % (total * 1000))
+    return ', '.join(parts)
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """JSON provider recording jsonify() as the 'serialize' span"""
+
+    def dumps(self, obj, **kwargs):
+        with span('serialize'):
+            return super().dumps(obj, **kwargs)
+
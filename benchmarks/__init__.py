@@ -0,0 +1 @@
+"""Endpoint benchmarks of the v2 API, see benchmarks/README.md"""
@@ -0,0 +1,254 @@
+"""benchmarks/run.py
+
+Start the app under gunicorn against a seeded mongod, send a fixed number
+of requests at a fixed concurrency to every GET route of the v2 blueprints
+and write p50/p95/p99 latency and throughput per scenario to a JSON report.
+The run fails when a scenario answered with errors (status >= 400), and,
+with --baseline, when a p99 regressed by more than --max-regression
+percent against a previous report.
+
+    python -m benchmarks.run --output report.json [--baseline baseline.json]
+"""
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from app import app
+from app.api.auth import generate_api_key
+
+# Values of the path variables of the v2 routes, matching benchmarks.seed
+PATH_VALUES = {
+    'bank': 'vcb',
+    'vendor': 'sjc',
+    'province_id': '01',
+    'district_id': '001'
+}
+
+
+def get_query_variants(rule):
+    """(label, query string) pairs to benchmark for a route.
+
+    Labels name dates relative to today, so reports of different days
+    can be compared.
+    """
+    today = datetime.date.today()
+    month_ago = today - datetime.timedelta(days=30)
+    year_ago = today - datetime.timedelta(days=365)
+    epoch_range = 'date_from=%s&date_to=%s' % (
+        int(time.mktime(year_ago.timetuple())), int(time.mktime(today.timetuple())))
+
+    if rule.endswith('/history'):
+        return [
+            ('?currency=USD&interval=hour&from=-30d',
+             '?currency=USD&interval=hour&from=%s' % month_ago),
+            ('?currency=USD&interval=day&from=-1y',
+             '?currency=USD&interval=day&from=%s' % year_ago),
+            ('?currency=USD&interval=week&from=-1y',
+             '?currency=USD&interval=week&from=%s' % year_ago),
+        ]
+    if rule.endswith('/stats'):
+        return [('', ''), ('?from=-1y', '?from=%s' % year_ago)]
+    if rule.startswith('/api/v2/exchange_rate/'):
+        return [('', ''), ('?currency=USD', '?currency=USD'), ('?date=-30d', '?date=%s' % month_ago)]
+    if rule.startswith('/api/v2/gold/'):
+        return [
+            ('', ''),
+            ('?date_from=-1y&date_to=now', '?' + epoch_range),
+            ('?date_from=-1y&date_to=now&interval=week', '?%s&interval=week' % epoch_range),
+        ]
+    return [('', '')]
+
+
+def get_scenarios():
+    """(name, path) of every GET route of the v2 blueprints and its variants"""
+    scenarios = []
+    adapter = app.url_map.bind('localhost')
+    for rule in sorted(app.url_map.iter_rules(), key=lambda r: r.rule):
+        if not rule.rule.startswith('/api/v2/') or 'GET' not in rule.methods:
+            continue
+        path = adapter.build(rule.endpoint, {k: PATH_VALUES[k] for k in rule.arguments})
+        for label, query in get_query_variants(rule.rule):
+            scenarios.append((rule.rule + label, path + query))
+    return scenarios
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return None
+    index = max(0, min(len(values) - 1, int(round(q / 100 * len(values))) - 1))
+    return values[index]
+
+
+def run_scenario(base_url, path, headers, requests_count, concurrency, warmup):
+    """Latency and throughput of one scenario"""
+    local = threading.local()
+
+    def call(_):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        started = time.perf_counter()
+        response = session.get(base_url + path, headers=headers)
+        return time.perf_counter() - started, response.status_code
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(call, range(warmup)))
+        started = time.perf_counter()
+        results = list(executor.map(call, range(requests_count)))
+        elapsed = time.perf_counter() - started
+
+    latencies = sorted(seconds * 1000 for seconds, _ in results)
+    return {
+        'requests': requests_count,
+        'errors': sum(1 for _, status in results if status >= 400),
+        'throughput_rps': round(requests_count / elapsed, 1),
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3)
+    }
+
+
+def start_server(args):
+    """gunicorn serving the app against the benchmark mongod"""
+    env = dict(
+        os.environ,
+        FLASK_ENV='production',
+        MONGODB_HOST=args.mongodb_host,
+        MONGODB_PORT=str(args.mongodb_port),
+        MONGODB_USER='',
+        MONGODB_PASSWORD='',
+        RATELIMIT_ENABLED='0',
+        METRICS_DIR=tempfile.mkdtemp(prefix='vapi-bench-metrics-')
+    )
+    server = subprocess.Popen([
+        sys.executable, '-m', 'gunicorn',
+        '-w', str(args.workers),
+        '-b', '127.0.0.1:%s' % args.port,
+        '--log-level', 'warning',
+        'app:app'
+    ], env=env)
+    base_url = 'http://127.0.0.1:%s' % args.port
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            requests.get(base_url + '/metrics', timeout=1)
+            return server, base_url
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError('gunicorn did not start on port %s' % args.port)
+
+
+def compare(report, baseline, max_regression):
+    """Print the change of every scenario against a baseline, return failures"""
+    failures = []
+    for name, result in report['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            print('%-80s new' % name)
+            continue
+        changes = {
+            key: (result[key] - before[key]) / before[key] * 100 if before[key] else 0
+            for key in ('p50_ms', 'p99_ms', 'throughput_rps')
+        }
+        print('%-80s p50 %+6.1f%%  p99 %+6.1f%%  rps %+6.1f%%' % (
+            name, changes['p50_ms'], changes['p99_ms'], changes['throughput_rps']))
+        if changes['p99_ms'] > max_regression:
+            failures.append(name)
+    return failures
+
+
+def get_revision():
+    """Commit of the benchmarked tree"""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--mongodb-host', default='127.0.0.1')
+    parser.add_argument('--mongodb-port', type=int, default=27017)
+    parser.add_argument('--url', help='Benchmark a running server instead of starting gunicorn')
+    parser.add_argument('--port', type=int, default=5199)
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=500, help='Requests per scenario')
+    parser.add_argument('--warmup', type=int, default=50, help='Unmeasured requests per scenario')
+    parser.add_argument('--filter', default='', help='Only scenarios containing this text')
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--baseline', help='Previous report to compare with')
+    parser.add_argument('--max-regression', type=float, default=10,
+                        help='Largest accepted p99 regression against the baseline, in percent')
+    args = parser.parse_args()
+
+    with app.app_context():
+        # Admin key, like flask vapi issue-api-key --admin, for /api/v2/admin/*
+        api_key = generate_api_key(permission=2, dtl=1, admin=True)
+    headers = {'Authorization': 'Bearer %s' % api_key}
+
+    server = None
+    base_url = args.url
+    if not base_url:
+        server, base_url = start_server(args)
+    try:
+        results = {}
+        for name, path in get_scenarios():
+            if args.filter not in name:
+                continue
+            results[name] = run_scenario(
+                base_url, path, headers, args.requests, args.concurrency, args.warmup)
+            print('%-80s p50 %8.2f ms  p99 %8.2f ms  %8.1f rps  %s errors' % (
+                name, results[name]['p50_ms'], results[name]['p99_ms'],
+                results[name]['throughput_rps'], results[name]['errors']))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    errors = sorted(name for name, result in results.items() if result['errors'])
+    report = {
+        'failed_scenarios': errors,
+        'meta': {
+            'revision': get_revision(),
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'workers': None if args.url else args.workers,
+            'concurrency': args.concurrency,
+            'requests': args.requests
+        },
+        'results': results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print('report written to %s' % args.output)
+
+    failed = False
+    if errors:
+        print('scenarios answered with errors: %s' % ', '.join(errors))
+        failed = True
+    if args.baseline:
+        with open(args.baseline) as f:
+            failures = compare(report, json.load(f), args.max_regression)
+        if failures:
+            print('p99 regressed by more than %s%%: %s' % (
+                args.max_regression, ', '.join(failures)))
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""benchmarks/seed.py
+
+Seed a local mongod with synthetic exchange rate and gold history (see
+``app.db.synthetic``) and province data, then build the indexes the
+endpoints read, exactly like a production deployment would have them.
+
+    python -m benchmarks.seed --host 127.0.0.1 --years 2 --drop
+"""
+import argparse
+import datetime
+
+import pymongo
+
+from app.db.indexes import ensure_indexes
+from app.db.synthetic import generate_history, insert_batches
+
+BATCH_SIZE = 5000
+
+
+def province_docs(provinces, districts, wards):
+    """Province, district and ward documents with zero-padded string ids"""
+    province_rows, district_rows, ward_rows = [], [], []
+    for p in range(1, provinces + 1):
+        province_id = '%02d' % p
+        province_rows.append({
+            'province_id': province_id,
+            'province_name': 'Province %s' % province_id,
+            'province_type': 'Thanh pho Trung uong' if p <= 5 else 'Tinh'
+        })
+        for d in range(1, districts + 1):
+            district_id = '%03d' % ((p - 1) * districts + d)
+            district_rows.append({
+                'province_id': province_id,
+                'district_id': district_id,
+                'district_name': 'District %s' % district_id
+            })
+            for w in range(1, wards + 1):
+                ward_id = '%05d' % (((p - 1) * districts + d - 1) * wards + w)
+                ward_rows.append({
+                    'district_id': district_id,
+                    'ward_id': ward_id,
+                    'ward_name': 'Ward %s' % ward_id
+                })
+    return province_rows, district_rows, ward_rows
+
+
+def seed(client, years=2, interval_seconds=600, change_probability=0.1, drop=False,
+         seed_value=0, timezone='UTC'):
+    """Seed every collection the v2 endpoints read"""
+    if drop:
+        client.drop_database('vapi')
+        client.drop_database('province_db')
+
+    date_to = datetime.datetime.now().replace(microsecond=0)
+    date_from = date_to - datetime.timedelta(days=365 * years)
+    for collection, count in generate_history(
+            client['vapi'], date_from, date_to,
+            interval_seconds=interval_seconds,
+            change_probability=change_probability,
+            batch_size=BATCH_SIZE,
+            seed=seed_value,
+            timezone=timezone):
+        print('%s seeded, %s documents' % (collection, count))
+
+    province_db = client['province_db']
+    for name, rows in zip(('province', 'district', 'ward'), province_docs(63, 10, 10)):
+        insert_batches(province_db[name], rows, BATCH_SIZE)
+        print('province_db.%s seeded' % name)
+
+    ensure_indexes(client)
+    print('indexes built')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=27017)
+    parser.add_argument('--years', type=float, default=2, help='Years of history per collection')
+    parser.add_argument('--interval-seconds', type=int, default=600,
+                        help='Seconds between two ticks')
+    parser.add_argument('--change-probability', type=float, default=0.1,
+                        help='Probability that a price changes at a tick')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed, for reproducible data')
+    parser.add_argument('--timezone', default='UTC', help='BUCKET_TIMEZONE of the rollups')
+    parser.add_argument('--drop', action='store_true', help='Drop vapi and province_db first')
+    args = parser.parse_args()
+
+    client = pymongo.MongoClient(args.host, args.port)
+    seed(client, args.years, args.interval_seconds, args.change_probability, args.drop,
+         args.seed, args.timezone)
+
+
+if __name__ == '__main__':
+    main()
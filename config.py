@@ -1,5 +1,6 @@
 """vauth/app/config.py"""
 import os
+import tempfile
 from dotenv import load_dotenv
 
 basedir = os.path.abspath(os.path.dirname(__file__))
@@ -10,6 +11,47 @@ class Config(object):
     """BaseConfig"""
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'vapi'
     VPRICE_FCM_KEY = os.environ.get('VPRICE_FCM_KEY') or 'vapi'
+    MONGODB_POOL_CONFIG = {
+        'maxPoolSize': int(os.environ.get('MONGODB_MAX_POOL_SIZE') or 50),
+        'minPoolSize': int(os.environ.get('MONGODB_MIN_POOL_SIZE') or 0),
+        'maxIdleTimeMS': int(os.environ.get('MONGODB_MAX_IDLE_TIME_MS') or 60000),
+        'connectTimeoutMS': int(os.environ.get('MONGODB_CONNECT_TIMEOUT_MS') or 5000),
+        'serverSelectionTimeoutMS': int(os.environ.get('MONGODB_SERVER_SELECTION_TIMEOUT_MS') or 5000),
+        'socketTimeoutMS': int(os.environ.get('MONGODB_SOCKET_TIMEOUT_MS') or 30000),
+        'waitQueueTimeoutMS': int(os.environ.get('MONGODB_WAIT_QUEUE_TIMEOUT_MS') or 5000)
+    }
+    # Threads of the fan_out pool issuing independent queries concurrently;
+    # one pool per worker process, shared by all its concurrent requests
+    MONGODB_FAN_OUT_WORKERS = int(os.environ.get('MONGODB_FAN_OUT_WORKERS') or 8)
+    MONGODB_CREATE_INDEXES = os.environ.get('MONGODB_CREATE_INDEXES') == '1'
+    CACHE_VERSION_CHECK_MS = int(os.environ.get('CACHE_VERSION_CHECK_MS') or 1000)
+    HISTORY_MAX_POINTS = int(os.environ.get('HISTORY_MAX_POINTS') or 1000)
+    # Verified api_keys kept per worker, 0 verifies every request
+    JWT_CACHE_SIZE = int(os.environ.get('JWT_CACHE_SIZE') or 10000)
+    # api_key usage is counted in memory and written to vapi.api_usage
+    USAGE_METERING = os.environ.get('USAGE_METERING') != '0'
+    USAGE_FLUSH_SECONDS = int(os.environ.get('USAGE_FLUSH_SECONDS') or 10)
+    # Send Server-Timing to every client, not only to keys with a timing claim
+    SERVER_TIMING = os.environ.get('SERVER_TIMING') == '1'
+    # MongoDB commands slower than this are logged with their endpoint
+    SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS') or 100)
+    # Every worker writes its request metrics there for /metrics
+    METRICS_DIR = os.environ.get('METRICS_DIR') or os.path.join(tempfile.gettempdir(), 'vapi-metrics')
+    METRICS_WRITE_SECONDS = int(os.environ.get('METRICS_WRITE_SECONDS') or 5)
+    # Rate limit counters are shared by every worker using the same storage:
+    # memory:// (per worker), redis://, redis+unix:// (local workers) ...
+    RATELIMIT_STORAGE_URI = os.environ.get('RATELIMIT_STORAGE_URI') or 'memory://'
+    RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED') != '0'
+    RATELIMIT_IN_MEMORY_FALLBACK_ENABLED = True
+    RATELIMIT_DEFAULT = os.environ.get('RATELIMIT_DEFAULT') or '100 per minute'
+    # Limits per tier of the keys issued by flask vapi issue-api-key
+    RATELIMIT_TIERS = {
+        'partner': '1000 per minute',
+        'scraper': '600 per minute'
+    }
+    # Datetimes are stored as naive server local time, so buckets are cut
+    # in UTC by default; use Asia/Ho_Chi_Minh when the server clock is UTC
+    BUCKET_TIMEZONE = os.environ.get('BUCKET_TIMEZONE') or 'UTC'
 
 
 class DevelopmentConfig(Config):
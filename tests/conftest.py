@@ -0,0 +1,35 @@
+"""tests/conftest.py"""
+import os
+
+import pytest
+
+os.environ.setdefault('FLASK_ENV', 'testing')
+os.environ.setdefault('SECRET_KEY', 'vapi-tests-secret-key-of-32-bytes')
+
+from app import app as flask_app  # noqa: E402  pylint: disable=C
+from app.api.auth import generate_api_key, token_cache  # noqa: E402  pylint: disable=C
+
+
+@pytest.fixture
+def app():
+    """App with rate limiting off and an empty token cache"""
+    flask_app.config['RATELIMIT_ENABLED'] = False
+    token_cache.clear()
+    yield flask_app
+    token_cache.clear()
+
+
+@pytest.fixture
+def client(app):
+    """Flask test client"""
+    return app.test_client()
+
+
+@pytest.fixture
+def make_api_key(app):
+    """Issue an api_key with the given claims"""
+    def make(**kwargs):
+        with app.app_context():
+            api_key = generate_api_key(**kwargs)
+        return api_key if isinstance(api_key, str) else api_key.decode()
+    return make
@@ -0,0 +1,104 @@
+"""tests/test_auth.py"""
+import time
+
+import pytest
+
+from app.api.auth import TokenCache, get_api_key, get_api_key_digest
+from app.api.rate_limit import get_rate_limit, get_rate_limit_key
+
+
+@pytest.mark.parametrize('headers', [
+    {'Authorization': 'Bearer'},
+    {'Authorization': 'Bearer '},
+    {'Authorization': 'Bearer    '},
+    {'Authorization': 'token'},
+])
+def test_get_api_key_malformed_header(app, headers):
+    with app.test_request_context(headers=headers):
+        assert get_api_key() is False
+
+
+def test_get_api_key_header_and_query(app):
+    with app.test_request_context(headers={'Authorization': 'Bearer abc'}):
+        assert get_api_key() == 'abc'
+    with app.test_request_context('/?api_key=abc'):
+        assert get_api_key() == 'abc'
+    with app.test_request_context():
+        assert get_api_key() is False
+
+
+def test_malformed_header_is_403(client):
+    response = client.get('/api/v2/admin/usage', headers={'Authorization': 'Bearer'})
+    assert response.status_code == 403
+    assert 'No api_key' in response.get_json()['message']
+
+
+def test_token_cache_expiry():
+    cache = TokenCache()
+    cache.put('live', {'exp': time.time() + 60}, 10)
+    cache.put('expired', {'exp': time.time() - 1}, 10)
+    assert cache.get('live') is not None
+    assert cache.get('expired') is None
+    assert cache.stats() == {'size': 1, 'hits': 1, 'misses': 1}
+
+
+def test_token_cache_skips_payload_without_exp():
+    cache = TokenCache()
+    cache.put('forever', {'scope': '*'}, 10)
+    cache.put('disabled', {'exp': time.time() + 60}, 0)
+    assert cache.stats()['size'] == 0
+
+
+def test_token_cache_evicts_least_recently_used():
+    cache = TokenCache()
+    exp = time.time() + 60
+    cache.put('a', {'exp': exp}, 2)
+    cache.put('b', {'exp': exp}, 2)
+    assert cache.get('a') is not None
+    cache.put('c', {'exp': exp}, 2)
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.get('c') is not None
+    assert cache.stats()['size'] == 2
+
+
+def test_rate_limit_without_api_key(app):
+    with app.test_request_context(environ_base={'REMOTE_ADDR': '10.0.0.1'}):
+        assert get_rate_limit_key() == 'ip:10.0.0.1'
+        assert get_rate_limit() == app.config['RATELIMIT_DEFAULT']
+
+
+def test_rate_limit_key_without_tier(app, make_api_key):
+    api_key = make_api_key(permission=2)
+    with app.test_request_context(headers={'Authorization': 'Bearer ' + api_key},
+                                  environ_base={'REMOTE_ADDR': '10.0.0.1'}):
+        assert get_rate_limit_key() == 'ip:10.0.0.1'
+        assert get_rate_limit() == app.config['RATELIMIT_DEFAULT']
+
+
+def test_rate_limit_key_with_tier(app, make_api_key):
+    api_key = make_api_key(tier='partner')
+    with app.test_request_context(headers={'Authorization': 'Bearer ' + api_key},
+                                  environ_base={'REMOTE_ADDR': '10.0.0.1'}):
+        assert get_rate_limit_key() == 'key:' + get_api_key_digest(api_key)
+        assert get_rate_limit() == app.config['RATELIMIT_TIERS']['partner']
+
+
+def test_rate_limit_unknown_tier_gets_default(app, make_api_key):
+    api_key = make_api_key(tier='unknown')
+    with app.test_request_context(headers={'Authorization': 'Bearer ' + api_key}):
+        assert get_rate_limit() == app.config['RATELIMIT_DEFAULT']
+
+
+def test_rate_limit_invalid_api_key(app):
+    with app.test_request_context(headers={'Authorization': 'Bearer invalid'},
+                                  environ_base={'REMOTE_ADDR': '10.0.0.1'}):
+        assert get_rate_limit_key() == 'ip:10.0.0.1'
+        assert get_rate_limit() == app.config['RATELIMIT_DEFAULT']
+
+
+def test_admin_route_without_admin_claim_is_403(client, make_api_key):
+    api_key = make_api_key(scope='admin', permission=2)
+    response = client.get('/api/v2/admin/usage', headers={'Authorization': 'Bearer ' + api_key})
+    assert response.status_code == 403
+    assert 'Not an admin key' in response.get_json()['message']